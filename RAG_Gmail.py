@@ -1,45 +1,98 @@
 # Standard library imports
 import base64
+import hashlib
 from datetime import datetime, timedelta, timezone
 from email import utils
-import chime
 import os
 import os.path
+import re
 import sqlite3
+import threading
 import time
 import traceback
 
 # Third-party library imports
-from bs4 import BeautifulSoup
+# The Groq SDK, BeautifulSoup and the Google API client (with gmail_fetch, which is built
+# on it) are imported where first needed; they dominate import time and the UI imports this module.
 import dateutil.parser
 from dotenv import load_dotenv
 import faiss
 import numpy as np
-import pyttsx3
-import speech_recognition as sr
 from tzlocal import get_localzone
-from groq import Groq
 
-# Google API imports
-from google.auth.transport.requests import Request
-from google.oauth2.credentials import Credentials
-from googleapiclient.discovery import build
-from google_auth_oauthlib.flow import InstalledAppFlow
+# Local modules
+from answer_cache import AnswerCache, normalize_question
+from chunking import chunk_text
+from context_builder import pack_emails, trim_history
+from embeddings import STOP_WORDS, create_embedder, embed_with_cache, text_hash
+from meta_store import format_date, get_meta_store
+from query_filters import describe_filters, filter_clause, filters_from_question
+from summarizer import TokenRateLimiter, estimate_tokens, ordered_map, prefetch
+import tracing
+from tracing import span, traced
+from transactions import extract_transaction, financial_overview, store_transactions
+
+load_dotenv(override=True)
 
 # Parameters
 INDEX_NAME = "index_email.index"
 DB_FILE = "index_email_metadata.db"
-EMBEDDING_DIM = 1536
+EMBEDDING_DIM = int(os.getenv('EMBEDDING_DIM', '1536'))  # Must match the EMBEDDER output size
 K = 25  # Number of Fetched Emails for Vector Search
+RETRIEVAL_MODE = os.getenv('RETRIEVAL_MODE', 'hybrid')  # 'vector', or 'hybrid' to fuse in BM25 over FTS5
+RRF_K = 60  # Reciprocal-rank fusion damping constant
+CONTEXT_TOKEN_BUDGET = int(os.getenv('CONTEXT_TOKEN_BUDGET', '3000'))  # Tokens of retrieved emails per prompt
+HISTORY_TOKEN_BUDGET = int(os.getenv('HISTORY_TOKEN_BUDGET', '6000'))  # Tokens of system prompt + conversation sent per turn
+ANSWER_CACHE_SIZE = int(os.getenv('ANSWER_CACHE_SIZE', '256'))
+ANSWER_CACHE_TTL = int(os.getenv('ANSWER_CACHE_TTL', '900'))  # Seconds; answers mention "today", so keep this short
+ANSWER_CACHE_THRESHOLD = float(os.getenv('ANSWER_CACHE_THRESHOLD', '0.95'))  # Cosine similarity for a hit
+INGEST_BATCH_SIZE = int(os.getenv('INGEST_BATCH_SIZE', '64'))  # Emails embedded and written per batch
+GMAIL_BATCH_SIZE = int(os.getenv('GMAIL_BATCH_SIZE', '50'))  # Messages per Gmail batch HTTP call (max 100)
+GMAIL_FETCH_WORKERS = int(os.getenv('GMAIL_FETCH_WORKERS', '4'))  # Concurrent batch calls
+GMAIL_LIST_PAGE_SIZE = 500  # Ids per messages.list page, Gmail's maximum
+PIPELINE_QUEUE_SIZE = int(os.getenv('PIPELINE_QUEUE_SIZE', '128'))  # Items buffered between ingestion stages
+CHECKPOINT_SECONDS = int(os.getenv('CHECKPOINT_SECONDS', '300'))  # Seconds between index checkpoints during a sync
+SKIPPED_FLUSH_SIZE = 500  # Skipped or unfetchable message ids recorded per write
+SUMMARY_CONCURRENCY = int(os.getenv('SUMMARY_CONCURRENCY', '4'))  # Parallel summarization calls
+SUMMARY_TOKENS_PER_MINUTE = int(os.getenv('SUMMARY_TOKENS_PER_MINUTE', '60000'))  # Groq TPM budget for summaries
+INGEST_MODE = os.getenv('INGEST_MODE', 'summary')  # 'summary': one LLM summary vector per email; 'chunks': body chunk vectors, no LLM
+CHUNK_TOKENS = int(os.getenv('CHUNK_TOKENS', '256'))  # Tokens per body chunk
+CHUNK_OVERLAP = int(os.getenv('CHUNK_OVERLAP', '48'))  # Tokens each chunk repeats from the one before
+CHUNK_SEARCH_FACTOR = 4  # Vector hits fetched per email returned, since one email can match with several chunks
+CHUNKS_PER_EMAIL = 3  # Best-matching chunks of an email passed to the prompt
+
+# Tracing: TRACING lists the exporters to enable (jsonl, prometheus), comma-separated; empty turns it off
+tracing.configure(os.getenv('TRACING', ''), os.getenv('TRACE_FILE', 'trace.jsonl'), os.getenv('METRICS_FILE', 'metrics.prom'))
 
 # Setting up the model & API key
-load_dotenv(override=True)
 GROQ_API_KEY = os.getenv('GROQ_API_KEY')
-client = Groq(api_key=GROQ_API_KEY)
+_client = None
+_client_lock = threading.Lock()
 
-def summerize_email(mail_from, mail_cc, mail_subject, mail_date, mail_body):
-    try:
-        system_content = '''
+def get_client():
+    """ Return the Groq client, importing the SDK and creating the client on first use. """
+    global _client
+    with _client_lock:
+        if _client is None:
+            from groq import Groq
+            _client = Groq(api_key=GROQ_API_KEY)
+        return _client
+
+# Vector index settings (override per deployment in .env)
+# INDEX_MODE is one of: flat, ivf_flat, ivf_pq, hnsw. Indexes start flat and are rebuilt
+# in INDEX_MODE once they hold INDEX_PROMOTE_THRESHOLD vectors. Deletes from an HNSW index rebuild it.
+INDEX_MODE = os.getenv('INDEX_MODE', 'ivf_flat')
+INDEX_PROMOTE_THRESHOLD = int(os.getenv('INDEX_PROMOTE_THRESHOLD', '20000'))
+IVF_NLIST = int(os.getenv('IVF_NLIST', '1024'))  # Upper bound, scaled down for small collections
+PQ_M = int(os.getenv('PQ_M', '64'))  # Sub-quantizers for ivf_pq, must divide EMBEDDING_DIM
+HNSW_M = int(os.getenv('HNSW_M', '32'))
+NPROBE = int(os.getenv('NPROBE', '16'))  # IVF lists visited per query
+EF_SEARCH = int(os.getenv('EF_SEARCH', '64'))  # HNSW candidate list size per query
+
+SUMMARY_MODEL = "meta-llama/llama-4-maverick-17b-128e-instruct"
+SUMMARY_MAX_TOKENS = 1000
+SUMMARY_PROMPT_VERSION = 1  # Bump whenever the summary prompt or model changes, to invalidate cached summaries
+SUMMARY_SYSTEM_PROMPT = '''
 Summerize the given Email in the following format, keep it brief but don't lose much information:
 
 OUTPUT FORMAT:
@@ -52,7 +105,8 @@ Email Context:
 <Email End>
 '''
 
-        prompt = f'''
+def build_summary_prompt(mail_from, mail_cc, mail_subject, mail_date, mail_body):
+    return f'''
 The email is the following: 
 
 date and time: {mail_date}
@@ -64,43 +118,69 @@ body: {mail_body}
 Please summarize this email according to the format above.
 '''
 
-        response = client.chat.completions.create(
-            model="meta-llama/llama-4-maverick-17b-128e-instruct",
-            messages=[
-                {"role": "system", "content": system_content},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.3,
-            max_tokens=1000
-        )
-        
-        if response and hasattr(response, 'choices') and response.choices:
-            return response.choices[0].message.content
-        else:
-            # Fallback format if API fails
-            return f'''<Email Start>
+def fallback_summary(mail_from, mail_cc, mail_subject, mail_date, mail_body):
+    # Return a basic formatted version of the email
+    return f'''<Email Start>
 Date and Time: {mail_date}
 Sender: {mail_from}
 CC: {mail_cc}
 Subject: {mail_subject}
-Email Context: {mail_body[:500]}...
+Email Context: {mail_body[:500] if mail_body else "No body content available"}...
 <Email End>'''
-            
-    except Exception as e:
-        print(f"(EMAILS LOADER): Error summarizing email: {e}")
-        # Return a basic formatted version of the email
-        return f'''<Email Start>
+
+def email_document(mail_from, mail_cc, mail_subject, mail_date, mail_body):
+    # The summary layout with the whole body as context, for emails indexed by chunks
+    return f'''<Email Start>
 Date and Time: {mail_date}
 Sender: {mail_from}
 CC: {mail_cc}
 Subject: {mail_subject}
-Email Context: {mail_body[:500] if mail_body else "No body content available"}...
+Email Context: {mail_body or "No body content available"}
 <Email End>'''
 
+def document_excerpt(document, chunks):
+    """ An email_document cut down to the given body chunks. """
+    header = document.split("Email Context: ", 1)[0]
+    return f"{header}Email Context: {' ... '.join(chunks)}\n<Email End>"
+
+def request_email_summary(prompt):
+    """ Ask the LLM for a summary. Returns (summary or None, total tokens used); raises on API errors. """
+    response = get_client().chat.completions.create(
+        model=SUMMARY_MODEL,
+        messages=[
+            {"role": "system", "content": SUMMARY_SYSTEM_PROMPT},
+            {"role": "user", "content": prompt}
+        ],
+        temperature=0.3,
+        max_tokens=SUMMARY_MAX_TOKENS
+    )
+    usage = getattr(response, 'usage', None)
+    tokens_used = getattr(usage, 'total_tokens', None)
+    if response and hasattr(response, 'choices') and response.choices:
+        return response.choices[0].message.content, tokens_used
+    return None, tokens_used
+
+def summerize_email(mail_from, mail_cc, mail_subject, mail_date, mail_body):
+    try:
+        prompt = build_summary_prompt(mail_from, mail_cc, mail_subject, mail_date, mail_body)
+        summary, _ = request_email_summary(prompt)
+        if summary:
+            return summary
+        # Fallback format if API fails
+        return fallback_summary(mail_from, mail_cc, mail_subject, mail_date, mail_body)
+            
+    except Exception as e:
+        print(f"(EMAILS LOADER): Error summarizing email: {e}")
+        return fallback_summary(mail_from, mail_cc, mail_subject, mail_date, mail_body)
+
 # Gmail API Related Functions
 SCOPES = ['https://www.googleapis.com/auth/gmail.readonly']
 
 def authenticate_gmail():
+    from google.oauth2.credentials import Credentials
+    from google_auth_oauthlib.flow import InstalledAppFlow
+    from googleapiclient.discovery import build
+
     creds = None
     token_file = 'token.json'
     
@@ -117,6 +197,7 @@ def authenticate_gmail():
 
 def clean_html(html_content):
     """ Clean HTML content and extract plain text. """
+    from bs4 import BeautifulSoup
     try:
         if not html_content:
             return ""
@@ -148,11 +229,12 @@ def get_plain_text_body(parts):
 
     return plain_text if plain_text else html_text
 
-def get_message_details(service, user_id, msg_id):
+def parse_message_details(message):
+    """ Extract the From/Cc/Subject/Date headers and the plain text body of a full Gmail message. """
     try:
-        message = service.users().messages().get(userId=user_id, id=msg_id, format='full').execute()
         headers = message['payload']['headers']
         details = {header['name']: header['value'] for header in headers if header['name'] in ['From', 'Cc', 'Subject', 'Date']}
+        details['Labels'] = message.get('labelIds', [])
 
         payload = message['payload']
         if 'parts' in payload:
@@ -168,20 +250,66 @@ def get_message_details(service, user_id, msg_id):
         print(f'An error occurred: {error}')
         return None
 
-def list_messages(service, user_id, query=''):
+def get_message_details(service, user_id, msg_id):
     try:
-        messages = []
-        request = service.users().messages().list(userId=user_id, q=query)
-        while request is not None:
-            response = request.execute()
-            if 'messages' in response:
-                messages.extend(response['messages'])
-            request = service.users().messages().list_next(request, response)
-        return messages
+        message = service.users().messages().get(userId=user_id, id=msg_id, format='full').execute()
+        return parse_message_details(message)
     except Exception as error:
         print(f'An error occurred: {error}')
         return None
 
+def fetch_message_details(service, user_id, msg_ids, batch_size=GMAIL_BATCH_SIZE, workers=GMAIL_FETCH_WORKERS):
+    """ Yield (msg_id, details or None) in order, fetching concurrently through Gmail batch requests. """
+    from gmail_fetch import MessageFetcher
+
+    fetcher = MessageFetcher(service, user_id, batch_size=batch_size, workers=workers)
+    for msg_id, message in fetcher.fetch(msg_ids):
+        yield msg_id, parse_message_details(message) if message else None
+
+def iter_message_ids(service, user_id, query=''):
+    """ Yield the ids of the messages matching query, requesting each page only as the last one is used up. """
+    request = service.users().messages().list(userId=user_id, q=query, maxResults=GMAIL_LIST_PAGE_SIZE)
+    while request is not None:
+        response = request.execute()
+        for message in response.get('messages', []):
+            yield message['id']
+        request = service.users().messages().list_next(request, response)
+
+class HistoryExpiredError(Exception):
+    """ Raised when Gmail no longer has history records for the stored historyId. """
+
+def get_mailbox_history_id(service, user_id):
+    return service.users().getProfile(userId=user_id).execute()['historyId']
+
+def list_history_changes(service, user_id, start_history_id):
+    """ Return (added_ids, deleted_ids, latest_history_id) for changes since start_history_id. """
+    from googleapiclient.errors import HttpError
+
+    added = {}  # Ordered set of message ids
+    deleted = set()
+    latest_history_id = start_history_id
+    request = service.users().history().list(userId=user_id, startHistoryId=start_history_id,
+                                             historyTypes=['messageAdded', 'messageDeleted'])
+    while request is not None:
+        try:
+            response = request.execute()
+        except HttpError as error:
+            if error.resp.status == 404:
+                raise HistoryExpiredError(f"historyId {start_history_id} is no longer available") from error
+            raise
+        for record in response.get('history', []):
+            for item in record.get('messagesAdded', []):
+                msg_id = item['message']['id']
+                added[msg_id] = True
+                deleted.discard(msg_id)
+            for item in record.get('messagesDeleted', []):
+                msg_id = item['message']['id']
+                added.pop(msg_id, None)
+                deleted.add(msg_id)
+        latest_history_id = response.get('historyId', latest_history_id)
+        request = service.users().history().list_next(request, response)
+    return list(added), deleted, latest_history_id
+
 def get_last_checked_time():
     try:
         with open('last_checked.txt', 'r') as file:
@@ -194,79 +322,804 @@ def update_last_checked_time(timestamp):
         file.write(str(timestamp))
 
 # Vector Store Operations
-def get_embedding(text):
-    # For now, we'll use a simple text embedding approach
-    # In a production environment, you might want to use a dedicated embedding model
-    return np.random.rand(1, EMBEDDING_DIM)
-
-def get_index():
-    if os.path.exists(INDEX_NAME):
-        return faiss.read_index(INDEX_NAME)
+_embedder = None
+_embedder_lock = threading.Lock()
+
+def get_embedder():
+    """ Return the process-wide embedder selected by the EMBEDDER setting. """
+    global _embedder
+    with _embedder_lock:
+        if _embedder is None:
+            _embedder = create_embedder(EMBEDDING_DIM)
+        return _embedder
+
+def get_embedding(text, cursor=None):
+    # Passing the metadata cursor reuses (and fills) the embedding cache; queries skip it
+    with span('embed'):
+        return embed_with_cache(get_embedder(), [text], cursor)
+
+def gmail_vector_id(gmail_id):
+    """ Derive a stable, positive 64-bit FAISS id from a Gmail message id. """
+    digest = hashlib.blake2b(gmail_id.encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(digest, 'big') & 0x7FFFFFFFFFFFFFFF
+
+def chunk_vector_id(gmail_id, position):
+    """ Stable FAISS id of one body chunk of a message. """
+    return gmail_vector_id(f"{gmail_id}#{position}")
+
+def new_index():
+    return faiss.IndexIDMap2(faiss.IndexFlatL2(EMBEDDING_DIM))
+
+def migrate_positional_index(index):
+    """ Wrap a legacy positional index in an IndexIDMap2.
+
+    Legacy rows were stored so that FAISS position p matched Metadata.id p + 1, so the
+    vectors are re-added with exactly those ids.
+    """
+    id_map = new_index()
+    if index.ntotal:
+        vectors = index.reconstruct_n(0, index.ntotal)
+        id_map.add_with_ids(vectors, np.arange(1, index.ntotal + 1, dtype=np.int64))
+    return id_map
+
+def index_kind(index):
+    """ Return the INDEX_MODE name that describes an index. """
+    base = faiss.downcast_index(index.index) if isinstance(index, (faiss.IndexIDMap, faiss.IndexIDMap2)) else index
+    if isinstance(base, faiss.IndexIVFPQ):
+        return 'ivf_pq'
+    if isinstance(base, faiss.IndexIVF):
+        return 'ivf_flat'
+    if isinstance(base, faiss.IndexHNSW):
+        return 'hnsw'
+    return 'flat'
+
+def index_vectors(index):
+    """ Return (vectors, ids) for everything stored in an index. IVF-PQ vectors come back approximate. """
+    if isinstance(index, (faiss.IndexIDMap, faiss.IndexIDMap2)):
+        ids = faiss.vector_to_array(index.id_map).astype(np.int64)
+        vectors = faiss.downcast_index(index.index).reconstruct_n(0, index.ntotal)
+        return vectors, ids
+    ivf = faiss.extract_index_ivf(index)
+    vectors, ids = [], []
+    for list_no in range(ivf.nlist):
+        size = ivf.invlists.list_size(list_no)
+        if not size:
+            continue
+        ids.append(faiss.rev_swig_ptr(ivf.invlists.get_ids(list_no), size).copy())
+        list_vectors = np.empty((size, ivf.d), dtype=np.float32)
+        for offset in range(size):
+            ivf.reconstruct_from_offset(list_no, offset, faiss.swig_ptr(list_vectors[offset]))
+        vectors.append(list_vectors)
+    if not ids:
+        return np.empty((0, EMBEDDING_DIM), dtype=np.float32), np.empty(0, dtype=np.int64)
+    return np.vstack(vectors).astype(np.float32), np.concatenate(ids).astype(np.int64)
+
+def remove_vectors(index, ids):
+    """ Remove ids from an index in place and return how many were removed.
+
+    FAISS can't drop nodes from an HNSW graph, so an HNSW index that holds any of the ids is
+    emptied and rebuilt from the vectors it keeps. That costs a full rebuild, which only
+    deletions and re-indexed messages pay.
+    """
+    ids = np.asarray(ids, dtype=np.int64)
+    if index_kind(index) != 'hnsw':
+        return index.remove_ids(ids)
+    vectors, stored_ids = index_vectors(index)
+    keep = ~np.isin(stored_ids, ids)
+    if keep.all():
+        return 0
+    index.reset()
+    if keep.any():
+        index.add_with_ids(np.ascontiguousarray(vectors[keep]), np.ascontiguousarray(stored_ids[keep]))
+    return int((~keep).sum())
+
+def search_parameters(index, selector=None, nprobe=None, ef_search=None):
+    """ Per-call search parameters, so query-time knobs never touch the shared index.
+
+    With a selector, the search is restricted to the ids it accepts. IVF searches then probe
+    every list by default, since the allowed ids may sit in lists the usual nprobe would
+    skip; the selector keeps that cheap by rejecting ids before any distance is computed.
+    """
+    base = faiss.downcast_index(index.index) if isinstance(index, (faiss.IndexIDMap, faiss.IndexIDMap2)) else index
+    if isinstance(base, faiss.IndexIVF):
+        default_nprobe = base.nlist if selector is not None else NPROBE
+        return faiss.SearchParametersIVF(sel=selector, nprobe=min(nprobe or default_nprobe, base.nlist))
+    if isinstance(base, faiss.IndexHNSW):
+        return faiss.SearchParametersHNSW(sel=selector, efSearch=ef_search or EF_SEARCH)
+    return faiss.SearchParameters(sel=selector)
+
+def exact_search(index, query_embedding, k, allowed_ids):
+    """ Brute-force search over just the allowed vectors of an IDMap2 index.
+
+    HNSW skips filtered-out nodes while walking its graph, so a selective filter strands
+    it with few or no results; scanning the allowed vectors is exact, and cheap at the
+    sizes filters leave. Allowed ids without a vector, like chunked emails', are ignored.
+    """
+    stored_ids = faiss.vector_to_array(index.id_map)
+    positions = np.flatnonzero(np.isin(stored_ids, allowed_ids))
+    k = min(k, len(positions))
+    if not k:
+        empty = np.empty((len(query_embedding), 0))
+        return empty.astype(np.float32), empty.astype(np.int64)
+    allowed = faiss.IndexFlatL2(index.d)
+    allowed.add(faiss.downcast_index(index.index).reconstruct_batch(positions))
+    distances, found = allowed.search(query_embedding, k)
+    return distances, np.where(found >= 0, stored_ids[positions][found], -1)
+
+def configure_search(index, nprobe=None, ef_search=None):
+    """ Apply query-time knobs: nprobe for IVF indexes, efSearch for HNSW. """
+    base = faiss.downcast_index(index.index) if isinstance(index, (faiss.IndexIDMap, faiss.IndexIDMap2)) else index
+    if isinstance(base, faiss.IndexIVF):
+        base.nprobe = min(nprobe or NPROBE, base.nlist)
+    elif isinstance(base, faiss.IndexHNSW):
+        base.hnsw.efSearch = ef_search or EF_SEARCH
+
+def build_index(mode, vectors, ids):
+    """ Build an index of the given INDEX_MODE over vectors/ids, training it if needed. """
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    ids = np.ascontiguousarray(ids, dtype=np.int64)
+    if mode == 'flat':
+        index = new_index()
+    elif mode == 'hnsw':
+        index = faiss.index_factory(EMBEDDING_DIM, f"IDMap2,HNSW{HNSW_M}")
+    elif mode in ('ivf_flat', 'ivf_pq'):
+        # Keep roughly 39+ training points per centroid, as k-means expects
+        nlist = max(1, min(IVF_NLIST, int(4 * np.sqrt(len(vectors))), len(vectors) // 39))
+        description = f"IVF{nlist},Flat" if mode == 'ivf_flat' else f"IVF{nlist},PQ{PQ_M}"
+        index = faiss.index_factory(EMBEDDING_DIM, description)
+        index.train(vectors)
     else:
-        return faiss.IndexFlatL2(EMBEDDING_DIM)
+        raise ValueError(f"Unknown index mode: {mode}")
+    if len(vectors):
+        index.add_with_ids(vectors, ids)
+    configure_search(index)
+    return index
+
+def maybe_promote_index(index, mode=INDEX_MODE, threshold=INDEX_PROMOTE_THRESHOLD):
+    """ Rebuild a flat index in the configured mode once it is large enough. """
+    if mode == 'flat' or index_kind(index) != 'flat' or index.ntotal < threshold:
+        return index
+    print(f"(EMAILS LOADER): Promoting index with {index.ntotal} vectors from flat to {mode}.")
+    vectors, ids = index_vectors(index)
+    return build_index(mode, vectors, ids)
+
+def save_index(index, path=INDEX_NAME):
+    """ Write the index so that a crash leaves either the previous file or the new one, never a torn one. """
+    temp_path = path + '.tmp'
+    faiss.write_index(index, temp_path)
+    with open(temp_path, 'r+b') as f:
+        os.fsync(f.fileno())
+    os.replace(temp_path, path)
+    # Make the rename itself durable; Windows has no directory handles to sync
+    if hasattr(os, 'O_DIRECTORY'):
+        directory = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(directory)
+        finally:
+            os.close(directory)
+
+def get_index(path=INDEX_NAME):
+    if os.path.exists(path):
+        index = faiss.read_index(path)
+        if isinstance(index, faiss.IndexFlat):
+            index = migrate_positional_index(index)
+        configure_search(index)
+        return index
+    else:
+        return new_index()
+
+def fts_match_expression(query):
+    """ Turn a free-text question into an FTS5 OR-query of its meaningful tokens.
+
+    Tokens like 135.00, 25/09/2025 or XXXX1854 are quoted whole so FTS5 matches them as phrases.
+    """
+    tokens = re.findall(r"[a-z0-9]+(?:[.,/:-][a-z0-9]+)*", query.lower())
+    terms = list(dict.fromkeys(t for t in tokens if t not in STOP_WORDS))
+    return " OR ".join(f'"{term}"' for term in terms)
+
+def reciprocal_rank_fusion(rankings, k=RRF_K):
+    """ Fuse several ranked id lists; ids ranked high in any list float to the top. """
+    scores = {}
+    for ranking in rankings:
+        for rank, item in enumerate(ranking):
+            scores[item] = scores.get(item, 0.0) + 1.0 / (k + rank + 1)
+    return sorted(scores, key=scores.get, reverse=True)
+
+def get_setting(cursor, key, default=None):
+    cursor.execute("SELECT value FROM Settings WHERE key=?", (key,))
+    row = cursor.fetchone()
+    return row[0] if row else default
+
+def set_setting(cursor, key, value):
+    cursor.execute("INSERT OR REPLACE INTO Settings (key, value) VALUES (?, ?)", (key, value))
 
 def initiate_meta_store():
-    conn = sqlite3.connect(DB_FILE)
+    # The calling thread's pooled connection, migrated to the current schema on first use
+    conn = get_meta_store(DB_FILE).connection()
     cursor = conn.cursor()
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS Metadata (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            text TEXT NOT NULL
-        )
-        ''')
     return (conn, cursor)
 
 def terminate_meta_store(conn):
+    # The connection stays open in the pool for this thread's next use
     conn.commit()
-    conn.close()
 
-def insert_email_record(full_email, index, cursor):
-    embedding = get_embedding(full_email)
-    index.add(embedding)
-    cursor.execute("INSERT INTO Metadata (text) VALUES (?)", (full_email,))
+class RetrievalEngine:
+    """ Keeps the FAISS index and the metadata connection resident across queries.
 
-def Vector_Search(query, demo=False, k=K):
-    try:
-        print(f"DEBUG: Starting Vector_Search with query: {query}")
-        index = get_index()
-        conn, cursor = initiate_meta_store()
-        query_embedding = get_embedding(query)
-        distances, indices = index.search(query_embedding, k)
-        decoded_texts = []
-        
-        print(f"DEBUG: Found {len(indices[0])} indices")
-        for idx in indices[0]:
+    The index is read from disk once and only reloaded when the file's mtime or size
+    changes, so a question costs a search instead of a full index deserialize.
+    """
+
+    def __init__(self, index_path=INDEX_NAME, db_path=DB_FILE):
+        self.index_path = index_path
+        self.store = get_meta_store(db_path)
+        self.generation = 0  # Bumped every time a different index is installed
+        self._lock = threading.RLock()
+        self._index = None
+        self._index_stamp = None
+        self._chunks_generation = None  # Generation has_chunks last looked at
+
+    def _file_stamp(self):
+        try:
+            stat = os.stat(self.index_path)
+            return (stat.st_mtime_ns, stat.st_size)
+        except FileNotFoundError:
+            return None
+
+    def _ensure_index(self):
+        stamp = self._file_stamp()
+        if self._index is None or stamp != self._index_stamp:
+            with span('index.load') as s:
+                self._index = get_index(self.index_path)
+                s.set(vectors=self._index.ntotal)
+            self._index_stamp = stamp
+            self.generation += 1
+        return self._index
+
+    def get_index(self):
+        with self._lock:
+            return self._ensure_index()
+
+    def current_generation(self):
+        """ Generation of the index queries would run against, reloading it first if the file changed. """
+        with self._lock:
+            self._ensure_index()
+            return self.generation
+
+    def install_index(self, index):
+        """ Adopt an index that was just written to disk, skipping the reload from file. """
+        with self._lock:
+            self._index = index
+            self._index_stamp = self._file_stamp()
+            self.generation += 1
+
+    def has_chunks(self):
+        """ Whether any email is indexed by chunks, checked again only when the index changes. """
+        with self._lock:
+            generation = self.current_generation()
+            if self._chunks_generation != generation:
+                cursor = self.store.connection().cursor()
+                cursor.execute("SELECT EXISTS (SELECT 1 FROM Chunks)")
+                self._has_chunks = bool(cursor.fetchone()[0])
+                self._chunks_generation = generation
+            return self._has_chunks
+
+    def allowed_ids(self, filters):
+        """ Vector ids of the emails, and of their chunks, matching filters, resolved through the indexed Metadata columns. """
+        clause, params = filter_clause(filters)
+        with span('metadata.filter', filters=describe_filters(filters)) as s:
+            cursor = self.store.connection().cursor()
+            cursor.execute(f"SELECT vector_id FROM Metadata WHERE {clause} UNION ALL "
+                           f"SELECT Chunks.vector_id FROM Chunks JOIN Metadata ON Metadata.gmail_id = Chunks.gmail_id "
+                           f"WHERE {clause}", params + params)
+            ids = np.array([row[0] for row in cursor.fetchall()], dtype=np.int64)
+            s.set(allowed=len(ids))
+            return ids
+
+    def search(self, query_embedding, k, nprobe=None, ef_search=None, allowed_ids=None):
+        index = self.get_index()
+        with span('faiss.search', k=k, kind=index_kind(index), filtered=allowed_ids is not None):
+            return self._search(query_embedding, k, nprobe, ef_search, allowed_ids)
+
+    def _search(self, query_embedding, k, nprobe, ef_search, allowed_ids):
+        # Search a snapshot of the index so a concurrent reload doesn't block readers
+        index = self.get_index()
+        selector = None
+        if allowed_ids is not None:
+            if not len(allowed_ids):
+                empty = np.empty((len(query_embedding), 0))
+                return empty.astype(np.float32), empty.astype(np.int64)
+            if index_kind(index) == 'hnsw':
+                return exact_search(index, query_embedding, k, allowed_ids)
+            selector = faiss.IDSelectorBatch(allowed_ids)
+        if selector is None and not (nprobe or ef_search):
+            return index.search(query_embedding, k)
+        return index.search(query_embedding, k, params=search_parameters(index, selector, nprobe, ef_search))
+
+    def email_hits(self, hit_ids):
+        """ Fold vector hits into emails, each ranked by its best hit.
+
+        Returns (email vector ids, {email vector id: chunk positions in hit order}); hits that
+        aren't chunks are email vectors already.
+        """
+        chunks = {}
+        if hit_ids and self.has_chunks():
+            placeholders = ",".join("?" * len(hit_ids))
+            cursor = self.store.connection().cursor()
+            cursor.execute(f"SELECT Chunks.vector_id, Metadata.vector_id, Chunks.position FROM Chunks "
+                           f"JOIN Metadata ON Metadata.gmail_id = Chunks.gmail_id "
+                           f"WHERE Chunks.vector_id IN ({placeholders})", hit_ids)
+            chunks = {chunk_id: (email_id, position) for chunk_id, email_id, position in cursor.fetchall()}
+        email_ids, positions = [], {}
+        for hit_id in hit_ids:
+            email_id, position = chunks.get(hit_id, (hit_id, None))
+            if email_id not in positions:
+                email_ids.append(email_id)
+                positions[email_id] = []
+            if position is not None:
+                positions[email_id].append(position)
+        return email_ids, positions
+
+    def fetch_texts(self, vector_ids, chunk_positions=None):
+        """ Fetch the texts for all email vector ids, returned as a {vector_id: text} dict.
+
+        Emails indexed by chunks come back as an excerpt of their best chunks, taken from
+        chunk_positions (see email_hits), or of their opening chunk for lexical-only hits.
+        """
+        if not vector_ids:
+            return {}
+        chunk_positions = chunk_positions or {}
+        placeholders = ",".join("?" * len(vector_ids))
+        # Each query thread reads through its own WAL connection, so ingestion doesn't block it
+        with span('metadata.fetch', ids=len(vector_ids)):
+            cursor = self.store.connection().cursor()
+            cursor.execute(f"SELECT vector_id, text, gmail_id, "
+                           f"EXISTS (SELECT 1 FROM Chunks WHERE Chunks.gmail_id = Metadata.gmail_id) "
+                           f"FROM Metadata WHERE vector_id IN ({placeholders})", list(vector_ids))
+            texts, chunked = {}, {}
+            for vector_id, text, gmail_id, has_chunks in cursor.fetchall():
+                texts[vector_id] = text
+                if has_chunks:
+                    chunked[vector_id] = (gmail_id, sorted(chunk_positions.get(vector_id, [0])[:CHUNKS_PER_EMAIL]))
+            if chunked:
+                chunk_ids = [chunk_vector_id(gmail_id, position) for gmail_id, positions in chunked.values()
+                             for position in positions]
+                placeholders = ",".join("?" * len(chunk_ids))
+                cursor.execute(f"SELECT vector_id, text FROM Chunks WHERE vector_id IN ({placeholders})", chunk_ids)
+                chunk_texts = dict(cursor.fetchall())
+                for vector_id, (gmail_id, positions) in chunked.items():
+                    excerpt = [chunk_texts[chunk_id] for chunk_id in
+                               (chunk_vector_id(gmail_id, position) for position in positions) if chunk_id in chunk_texts]
+                    texts[vector_id] = document_excerpt(texts[vector_id], excerpt)
+            return texts
+
+    def lexical_search(self, query, k, filters=None):
+        """ BM25-ranked vector ids for query from the FTS5 index, or [] when unavailable. """
+        match = fts_match_expression(query)
+        if not match:
+            return []
+        clause, params = filter_clause(filters or {})
+        with span('lexical.search', k=k) as s:
+            cursor = self.store.connection().cursor()
             try:
-                cursor.execute(f"SELECT text FROM Metadata WHERE id={idx + 1}")
-                result = cursor.fetchone()
-                if result:
-                    decoded_texts.append(result[0])
-                else:
-                    print(f"DEBUG: No text found for index {idx + 1}")
-            except Exception as e:
-                print(f"DEBUG: Error fetching text for index {idx + 1}: {str(e)}")
-        
-        conn.close()
-        
-        if demo:
-            print("Decoded texts of nearest neighbors:")
-            for text in decoded_texts:
+                cursor.execute(f'''
+                    SELECT Metadata.vector_id FROM MetadataFTS
+                    JOIN Metadata ON Metadata.id = MetadataFTS.rowid
+                    WHERE MetadataFTS MATCH ? AND {clause}
+                    ORDER BY bm25(MetadataFTS)
+                    LIMIT ?
+                    ''', [match] + params + [k])
+            except sqlite3.OperationalError as e:
+                print(f"DEBUG: Lexical search unavailable: {e}")
+                return []
+            ids = [row[0] for row in cursor.fetchall()]
+            s.set(found=len(ids))
+            return ids
+
+    def close(self):
+        with self._lock:
+            self._index = None
+            self._index_stamp = None
+
+_engine = None
+_engine_lock = threading.Lock()
+
+def get_retrieval_engine():
+    """ Return the process-wide RetrievalEngine, creating it on first use. """
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            _engine = RetrievalEngine()
+        return _engine
+
+def get_financial_overview(days=7):
+    """ Sidebar figures for the last `days` days, read from the transaction rollups. """
+    conn, cursor = initiate_meta_store()
+    return financial_overview(cursor, days)
+
+def is_email_indexed(cursor, gmail_id):
+    cursor.execute("SELECT 1 FROM Metadata WHERE gmail_id=?", (gmail_id,))
+    return cursor.fetchone() is not None
+
+def is_email_processed(cursor, gmail_id):
+    """ True if the message is stored, or an earlier sync already fetched and skipped it. """
+    cursor.execute("SELECT 1 FROM Metadata WHERE gmail_id=? "
+                   "UNION ALL SELECT 1 FROM IngestState WHERE gmail_id=? AND state='skipped'", (gmail_id, gmail_id))
+    return cursor.fetchone() is not None
+
+def set_ingest_state(cursor, gmail_ids, state):
+    cursor.executemany("INSERT OR REPLACE INTO IngestState (gmail_id, state) VALUES (?, ?)",
+                       [(gmail_id, state) for gmail_id in gmail_ids])
+
+def checkpoint_index(index, conn, cursor):
+    """ Make everything committed so far durable in the index file, then mark those emails indexed.
+
+    Callers commit their rows first. A crash before the state update only leaves emails
+    'stored' or 'deleted', and recover_stored_emails and recover_deleted_emails bring the
+    index file in line on the next run. Settings still uncommitted, like a new embedder's
+    name, commit with the state update.
+    """
+    with span('index.checkpoint', vectors=index.ntotal):
+        save_index(index)
+        with conn:
+            cursor.execute("UPDATE IngestState SET state='indexed' WHERE state='stored'")
+            cursor.execute("DELETE FROM IngestState WHERE state='deleted'")
+
+def recover_stored_emails(index, cursor, batch_size=500):
+    """ Re-add the vectors of emails committed after the last checkpoint of an interrupted sync.
+
+    Their summaries and chunks are already in the database and their embeddings in the
+    cache, so nothing is fetched or summarized again. Returns how many emails were recovered.
+    """
+    cursor.execute("SELECT gmail_id FROM IngestState WHERE state='stored'")
+    gmail_ids = [row[0] for row in cursor.fetchall()]
+    for start in range(0, len(gmail_ids), batch_size):
+        batch = gmail_ids[start:start + batch_size]
+        placeholders = ",".join("?" * len(batch))
+        cursor.execute(f"SELECT vector_id, text FROM Metadata WHERE gmail_id IN ({placeholders}) "
+                       f"AND NOT EXISTS (SELECT 1 FROM Chunks WHERE Chunks.gmail_id = Metadata.gmail_id) "
+                       f"UNION ALL SELECT vector_id, text FROM Chunks WHERE gmail_id IN ({placeholders})", batch + batch)
+        rows = cursor.fetchall()
+        if not rows:
+            continue
+        ids = np.array([row[0] for row in rows], dtype=np.int64)
+        # Some may have reached the index file before the crash
+        remove_vectors(index, ids)
+        index.add_with_ids(embed_with_cache(get_embedder(), [row[1] for row in rows], cursor), ids)
+    return len(gmail_ids)
+
+def recover_deleted_emails(index, cursor, probe_size=64):
+    """ Remove the vectors of emails deleted after the last checkpoint of an interrupted sync.
+
+    Their rows are gone, so the chunk ids are found by position: chunks are numbered from
+    0, and positions are removed a block at a time until a block removes nothing. Returns
+    how many emails were recovered.
+    """
+    cursor.execute("SELECT gmail_id FROM IngestState WHERE state='deleted'")
+    gmail_ids = [row[0] for row in cursor.fetchall()]
+    if gmail_ids:
+        remove_vectors(index, [gmail_vector_id(gmail_id) for gmail_id in gmail_ids])
+        start = 0
+        while remove_vectors(index, [chunk_vector_id(gmail_id, position) for gmail_id in gmail_ids
+                                     for position in range(start, start + probe_size)]):
+            start += probe_size
+    return len(gmail_ids)
+
+def delete_email_records(gmail_ids, index, cursor):
+    """ Remove emails from the index and the metadata store. Returns how many existed.
+
+    Each message's own vector id is derived from its Gmail id, so it is removed even without
+    a row, as when a delete is re-delivered after a crash. Chunk ids are only known from the
+    rows, so deleted emails stay 'deleted' in IngestState until the next checkpoint.
+    """
+    gmail_ids = list(gmail_ids)
+    deleted_ids, vector_ids = delete_email_rows(gmail_ids, cursor)
+    set_ingest_state(cursor, deleted_ids, 'deleted')
+    if gmail_ids:
+        remove_vectors(index, list({gmail_vector_id(gmail_id) for gmail_id in gmail_ids}.union(vector_ids)))
+    return len(deleted_ids)
+
+def delete_email_rows(gmail_ids, cursor):
+    """ Delete the rows of emails. Returns (gmail ids that had rows, vector ids of their emails and chunks). """
+    deleted_ids, vector_ids = [], []
+    for start in range(0, len(gmail_ids), 500):
+        batch = gmail_ids[start:start + 500]
+        placeholders = ",".join("?" * len(batch))
+        cursor.execute(f"SELECT gmail_id, vector_id FROM Metadata WHERE gmail_id IN ({placeholders})", batch)
+        for gmail_id, vector_id in cursor.fetchall():
+            deleted_ids.append(gmail_id)
+            vector_ids.append(vector_id)
+        cursor.execute(f"SELECT vector_id FROM Chunks WHERE gmail_id IN ({placeholders})", batch)
+        vector_ids.extend(row[0] for row in cursor.fetchall())
+        # The Chunks rows go with their Metadata row, by trigger
+        cursor.execute(f"DELETE FROM Metadata WHERE gmail_id IN ({placeholders})", batch)
+        # Skipped or unfetched messages have no Metadata row but may still have a state
+        cursor.execute(f"DELETE FROM IngestState WHERE gmail_id IN ({placeholders})", batch)
+    return deleted_ids, vector_ids
+
+def delete_legacy_records(since, index, cursor):
+    """ Drop rows stored before gmail ids were tracked and dated from `since` on, with their vectors.
+
+    A full resync lists that mail again and would store it a second time under its Gmail
+    id. Returns how many rows were dropped; the caller commits them only once the index
+    file is saved, so a crash in between leaves the rows to be dropped again.
+    """
+    cursor.execute("SELECT vector_id FROM Metadata WHERE gmail_id IS NULL AND date >= ?", (format_date(since),))
+    vector_ids = [row[0] for row in cursor.fetchall()]
+    if vector_ids:
+        # Their transactions go with them, by trigger
+        cursor.execute("DELETE FROM Metadata WHERE gmail_id IS NULL AND date >= ?", (format_date(since),))
+        remove_vectors(index, vector_ids)
+    return len(vector_ids)
+
+def delete_email_record(gmail_id, index, cursor):
+    """ Remove one email from the index and the metadata store. Returns True if it existed. """
+    return delete_email_records([gmail_id], index, cursor) > 0
+
+def insert_email_records(records, index, cursor):
+    """ Embed and store a batch of (full_email, email) pairs.
+
+    email is the dict prepare_emails yields (msg_id, from, subject, date, labels, body,
+    body_hash, and chunks in chunk mode); only msg_id is required. An email with chunks gets
+    a vector per chunk instead of one for full_email. The batch is embedded as one matrix,
+    added with one index.add_with_ids call and written with one executemany per table.
+    Re-indexed messages replace their previous vectors and rows.
+    """
+    # A message listed twice in one batch keeps its last summary
+    records = list({email['msg_id']: (full_email, email) for full_email, email in records}.values())
+    if not records:
+        return
+    # Only messages already stored have vectors to replace, so new mail costs no removal
+    _, replaced_ids = delete_email_rows([email['msg_id'] for _, email in records], cursor)
+    if replaced_ids:
+        remove_vectors(index, replaced_ids)
+    texts, vector_ids, chunk_rows = [], [], []
+    for full_email, email in records:
+        if email.get('chunks') is None:
+            texts.append(full_email)
+            vector_ids.append(gmail_vector_id(email['msg_id']))
+            continue
+        for position, chunk in enumerate(email['chunks']):
+            chunk_id = chunk_vector_id(email['msg_id'], position)
+            texts.append(chunk)
+            vector_ids.append(chunk_id)
+            chunk_rows.append((chunk_id, email['msg_id'], position, chunk))
+    embeddings = embed_with_cache(get_embedder(), texts, cursor)
+    index.add_with_ids(embeddings, np.array(vector_ids, dtype=np.int64))
+    # text is what lexical search and the prompt see: the summary, or a chunked email's whole
+    # document. Chunked emails keep their own vector_id as their key, with no vector behind it.
+    cursor.executemany("INSERT INTO Metadata (text, gmail_id, vector_id, sender, date, subject, body_hash, summary, labels) "
+                       "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                       [(full_email, email['msg_id'], gmail_vector_id(email['msg_id']), email.get('from'),
+                         format_date(email.get('date')), email.get('subject'), email.get('body_hash'),
+                         full_email if email.get('chunks') is None else None, ",".join(email.get('labels') or ()))
+                        for full_email, email in records])
+    cursor.executemany("INSERT INTO Chunks (vector_id, gmail_id, position, text) VALUES (?, ?, ?, ?)", chunk_rows)
+    # Bank alerts also become Transactions rows, which keep the sidebar's rollups current
+    transactions = [extract_transaction(email['msg_id'], email.get('body'), full_email, format_date(email.get('date')))
+                    for full_email, email in records]
+    store_transactions(cursor, [transaction for transaction in transactions if transaction])
+
+def insert_email_record(full_email, index, cursor, gmail_id):
+    insert_email_records([(full_email, {'msg_id': gmail_id})], index, cursor)
+
+def reembed_index(index, cursor, batch_size=256):
+    """ Rebuild the index from the stored email and chunk texts with the current embedder. """
+    # Emails indexed by chunks have vectors for their chunks only
+    cursor.execute("SELECT vector_id, text FROM Metadata "
+                   "WHERE NOT EXISTS (SELECT 1 FROM Chunks WHERE Chunks.gmail_id = Metadata.gmail_id) "
+                   "UNION ALL SELECT vector_id, text FROM Chunks")
+    rows = cursor.fetchall()
+    ids = np.array([row[0] for row in rows], dtype=np.int64)
+    vectors = np.empty((len(rows), EMBEDDING_DIM), dtype=np.float32)
+    for start in range(0, len(rows), batch_size):
+        texts = [row[1] for row in rows[start:start + batch_size]]
+        vectors[start:start + len(texts)] = embed_with_cache(get_embedder(), texts, cursor)
+    return build_index(index_kind(index), vectors, ids)
+
+def ensure_index_embedder(index, cursor):
+    """ Re-embed stored emails when the index was built by a different embedder. """
+    embedder_name = get_embedder().name
+    if get_setting(cursor, 'embedder') != embedder_name:
+        if index.ntotal:
+            print(f"(EMAILS LOADER): Re-embedding {index.ntotal} stored emails with {embedder_name}.")
+            index = reembed_index(index, cursor)
+        set_setting(cursor, 'embedder', embedder_name)
+    return index
+
+def Vector_Search(query, demo=False, k=K, nprobe=None, ef_search=None, mode=None, filters=None):
+    """ Top-k email texts for query.
+
+    filters (see query_filters) restrict the search to matching emails before ranking, so
+    the k results all come from inside the filter. When omitted they are taken from date
+    phrases in the query itself ("last week", "in September"); pass {} to search everything.
+    Inferred filters only rank their matches first: when fewer than k emails match, the
+    best matches from outside them fill the rest, since "my balance today" still wants the
+    latest balance on a day without an alert.
+    """
+    with span('vector_search', k=k) as trace:
+        try:
+            engine = get_retrieval_engine()
+            inferred = filters is None
+            if inferred:
+                filters = filters_from_question(query)
+            allowed_ids = None
+            if filters:
+                allowed_ids = engine.allowed_ids(filters)
+            query_embedding = get_embedding(query)
+
+            # Over-fetch only when several hits can fold into one email
+            search_k = k * CHUNK_SEARCH_FACTOR if engine.has_chunks() else k
+
+            def vector_hits(allowed_ids):
+                distances, indices = engine.search(query_embedding, search_k, nprobe, ef_search, allowed_ids)
+                # FAISS pads with -1 when the index holds fewer vectors than asked for
+                hit_ids = [int(idx) for idx in indices[0] if idx >= 0]
+                # Chunk hits are folded into their email, which ranks by its best chunk
+                vector_ids, chunk_positions = engine.email_hits(hit_ids)
+                return distances, hit_ids, vector_ids[:k], chunk_positions
+
+            distances, hit_ids, vector_ids, chunk_positions = vector_hits(allowed_ids)
+            if inferred and filters and len(vector_ids) < k:
+                _, _, wider_ids, wider_positions = vector_hits(None)
+                vector_ids += [vector_id for vector_id in wider_ids if vector_id not in chunk_positions][:k - len(vector_ids)]
+                chunk_positions = {**wider_positions, **chunk_positions}
+                trace.set(filter_fallback=True)
+            trace.set(vector_hits=len(hit_ids), vector_emails=len(vector_ids))
+            if (mode or RETRIEVAL_MODE) == 'hybrid':
+                lexical_ids = engine.lexical_search(query, k, filters)
+                trace.set(lexical_hits=len(lexical_ids))
+                vector_ids = reciprocal_rank_fusion([vector_ids, lexical_ids])[:k]
+            texts_by_id = engine.fetch_texts(vector_ids, chunk_positions)
+            decoded_texts = [texts_by_id[vector_id] for vector_id in vector_ids if vector_id in texts_by_id]
+            trace.set(returned=len(decoded_texts), missing_texts=len(vector_ids) - len(decoded_texts))
+            
+            if demo:
+                print("Decoded texts of nearest neighbors:")
+                for text in decoded_texts:
+                    print("*********************************************")
+                    print("########", text[31:56])
+                    print(text)
                 print("*********************************************")
-                print("########", text[31:56])
-                print(text)
-            print("*********************************************")
-            print("Distances to nearest neighbors:", distances)
-        
-        print(f"DEBUG: Returning {len(decoded_texts)} decoded texts")
-        return decoded_texts if decoded_texts else ["No relevant emails found."]
-        
-    except Exception as e:
-        print(f"DEBUG: Error in Vector_Search: {str(e)}")
-        print(f"DEBUG: Traceback: {traceback.format_exc()}")
-        return ["No relevant emails found due to an error in the search process."]
+                print("Distances to nearest neighbors:", distances)
+            
+            return decoded_texts if decoded_texts else ["No relevant emails found."]
+            
+        except Exception as e:
+            trace.set(error=type(e).__name__)
+            print(f"DEBUG: Error in Vector_Search: {str(e)}")
+            print(f"DEBUG: Traceback: {traceback.format_exc()}")
+            return ["No relevant emails found due to an error in the search process."]
 
-def load_emails():
+def get_cached_summary(cursor, gmail_id, body_hash):
+    cursor.execute("SELECT summary FROM SummaryCache WHERE gmail_id=? AND body_hash=? AND prompt_version=?",
+                   (gmail_id, body_hash, SUMMARY_PROMPT_VERSION))
+    row = cursor.fetchone()
+    return row[0] if row else None
+
+def store_cached_summary(cursor, gmail_id, body_hash, summary):
+    cursor.execute("INSERT OR REPLACE INTO SummaryCache (gmail_id, body_hash, prompt_version, summary) "
+                   "VALUES (?, ?, ?, ?)", (gmail_id, body_hash, SUMMARY_PROMPT_VERSION, summary))
+
+def summarize_messages(emails, cursor, concurrency=SUMMARY_CONCURRENCY, tokens_per_minute=SUMMARY_TOKENS_PER_MINUTE):
+    """ Summarize a stream of emails concurrently, yielding (email, summary) in input order.
+
+    Each email is a dict with msg_id, from, cc, subject, date and body. Summaries are cached
+    by (message id, body hash, prompt version), so only unseen emails reach the LLM, and
+    those calls are held under a tokens-per-minute budget. Fallback summaries produced
+    after an API error are not cached.
+    """
+    limiter = TokenRateLimiter(tokens_per_minute)
+
+    def with_cache_lookup():
+        # Runs on the caller's thread, which owns the SQLite cursor
+        for email in emails:
+            email['body_hash'] = text_hash(email['body'] or '')
+            yield email, get_cached_summary(cursor, email['msg_id'], email['body_hash'])
+
+    def summarize(item):
+        email, cached = item
+        if cached is not None:
+            return cached, False
+        fields = (email['from'], email['cc'], email['subject'], email['date'], email['body'])
+        prompt = build_summary_prompt(*fields)
+        estimated = estimate_tokens(SUMMARY_SYSTEM_PROMPT + prompt) + SUMMARY_MAX_TOKENS
+        limiter.acquire(estimated)
+        try:
+            summary, tokens_used = request_email_summary(prompt)
+        except Exception as e:
+            print(f"(EMAILS LOADER): Error summarizing email: {e}")
+            limiter.settle(estimated, estimated)
+            return fallback_summary(*fields), False
+        limiter.settle(estimated, tokens_used or estimated)
+        if not summary:
+            return fallback_summary(*fields), False
+        return summary, True
+
+    for (email, _), (summary, cacheable) in ordered_map(summarize, with_cache_lookup(), concurrency):
+        if cacheable:
+            store_cached_summary(cursor, email['msg_id'], email['body_hash'], summary)
+            # Committed straight away, so a crash never costs a summary and the write lock
+            # isn't held while this thread waits for the next email
+            cursor.connection.commit()
+        yield email, summary
+
+def chunk_messages(emails, size=CHUNK_TOKENS, overlap=CHUNK_OVERLAP):
+    """ Chunk-mode counterpart of summarize_messages, yielding (email, document) with no LLM calls.
+
+    Each email's body is split into overlapping token windows under email['chunks'].
+    """
+    for email in emails:
+        email['body_hash'] = text_hash(email['body'] or '')
+        document = email_document(email['from'], email['cc'], email['subject'], email['date'], email['body'])
+        # An email without a body is still findable, by its headers
+        email['chunks'] = chunk_text(email['body'], size, overlap) or [document]
+        yield email, document
+
+def prepare_emails(emails, cursor, mode=INGEST_MODE):
+    """ (email, text) pairs for insert_email_records: LLM summaries, or chunked bodies for bulk backfills. """
+    if mode == 'summary':
+        return summarize_messages(emails, cursor)
+    if mode == 'chunks':
+        return chunk_messages(emails)
+    raise ValueError(f"Unknown ingest mode: {mode}")
+
+def is_sync_candidate(details):
+    # Mirrors the full-sync query, since history records aren't filtered by it
+    return 'canara' in details.get('From', '').lower()
+
+def sync_mailbox(service, cursor, query):
+    """ Work out which messages changed since the last sync.
+
+    Returns (added_ids, deleted_ids, history_id, full_resync). With a stored historyId only
+    the changes since then are pulled via history.list; on the first run, or once Gmail has
+    expired that history, added_ids is a generator listing the mailbox with `query` page by
+    page, which raises if a page can't be fetched, and full_resync is True.
+    """
+    start_history_id = get_setting(cursor, 'history_id')
+    if start_history_id:
+        try:
+            return list_history_changes(service, 'me', start_history_id) + (False,)
+        except HistoryExpiredError as e:
+            print(f"(EMAILS LOADER): {e}; running a full resync.")
+
+    # Read the historyId before listing so mail arriving mid-listing is picked up next time
+    history_id = get_mailbox_history_id(service, 'me')
+    return iter_message_ids(service, 'me', query), set(), history_id, True
+
+def load_emails(progress=None, cancel_event=None):
+    """ Sync new Canara Bank mail into the index.
+
+    Listing, fetching and parsing, summarizing or chunking, and indexing run as a pipeline:
+    each stage streams into the next through a bounded queue, so a full backfill holds at
+    most a few batches of mail in memory besides the index itself, however large the mailbox.
+
+    The index is checkpointed every CHECKPOINT_SECONDS: batches are committed as they are
+    indexed, the index file is replaced atomically, and each message's IngestState records
+    how far it got. A sync that crashes or is killed resumes from its last batch on the next
+    run, without fetching or summarizing again what it had already stored.
+
+    progress, if given, is called from the pipeline's threads with dicts such as
+    {'stage': 'fetching', 'fetched': 3, 'summarized': 1, 'indexed': 0}; pass a queue's put
+    method to consume them from another thread. Setting cancel_event stops the sync after
+    the current email: everything summarized so far is still indexed, but the historyId
+    isn't advanced, so the next run picks up the rest. The same goes for a listing that
+    fails partway. Messages that can't be fetched are recorded as 'failed' and retried at
+    the start of the next sync.
+
+    Returns {'added', 'removed', 'cancelled'}.
+    """
     i = 1
+    counts = {'fetched': 0, 'summarized': 0, 'indexed': 0}
+
+    def report(stage):
+        if progress:
+            progress(dict(counts, stage=stage))
+
+    def cancelled():
+        return cancel_event is not None and cancel_event.is_set()
+
+    report('authenticating')
     service = authenticate_gmail()
     
     # Get current month's start date with timezone awareness
@@ -275,26 +1128,75 @@ def load_emails():
     
     # Create a more specific query for Canara Bank emails from current month
     query = f'after:{first_day_of_month.strftime("%Y/%m/%d")} from:canarabank OR from:canara'
-    messages = list_messages(service, 'me', query)
     
-    if not messages:
-        print('(EMAILS LOADER): No Canara Bank messages found for this month.')
-    else:
-        index = get_index()
+    index = get_index()
+    conn, cursor = initiate_meta_store()
+    # Vectors from an older embedder can't be compared with new queries, so refresh them first
+    embedder_changed = get_setting(cursor, 'embedder') != get_embedder().name
+    index = ensure_index_embedder(index, cursor)
+    # Emails an interrupted sync stored after its last checkpoint
+    emails_recovered = recover_stored_emails(index, cursor)
+    if emails_recovered:
+        print(f"(EMAILS LOADER): Recovered {emails_recovered} emails stored by an interrupted sync.")
+    # And emails it deleted whose vectors the index file still holds
+    emails_recovered += recover_deleted_emails(index, cursor)
+
+    report('listing')
+    added_ids, deleted_ids, history_id, full_resync = sync_mailbox(service, cursor, query)
+
+    with conn:
+        emails_deleted = delete_email_records(deleted_ids, index, cursor)
+    # Emails stored before gmail ids were tracked would be listed again by the resync
+    legacy_dropped = delete_legacy_records(first_day_of_month, index, cursor) if full_resync else 0
+    if legacy_dropped:
+        print(f"(EMAILS LOADER): Re-syncing {legacy_dropped} emails stored without a Gmail id.")
+    if embedder_changed or emails_recovered or emails_deleted or legacy_dropped:
+        checkpoint_index(index, conn, cursor)
+
+    listing = {'failed': False}
+
+    def new_ids():
+        # Runs on the listing thread, so it checks through that thread's own connection.
+        # Messages earlier syncs couldn't fetch go first; their history has already passed.
         conn, cursor = initiate_meta_store()
-        
-        # Limit to first 5 emails only
-        emails_processed = 0
-        max_emails = 5
-        
-        for msg in messages:
-            # Stop if we've already processed 5 emails
-            if emails_processed >= max_emails:
-                break
-                
-            msg_id = msg['id']
-            details = get_message_details(service, 'me', msg_id)
-            if details:
+        cursor.execute("SELECT gmail_id FROM IngestState WHERE state='failed'")
+        retried = {row[0] for row in cursor.fetchall()}
+        if retried:
+            print(f"(EMAILS LOADER): Retrying {len(retried)} emails an earlier sync couldn't fetch.")
+        yield from retried
+        try:
+            for msg_id in added_ids:
+                if msg_id not in retried and not is_email_processed(cursor, msg_id):
+                    yield msg_id
+        except Exception as e:
+            print(f"(EMAILS LOADER): Listing the mailbox failed, indexing what was listed: {e}")
+            listing['failed'] = True
+
+    def candidate_emails(msg_ids):
+        # Runs on the fetch thread; rejected and unfetched ids are recorded through its own
+        # connection, so a resumed sync doesn't fetch the first again and the next retries the second
+        conn, cursor = initiate_meta_store()
+        skipped, failed = [], []
+
+        def record_states():
+            with conn:
+                set_ingest_state(cursor, skipped, 'skipped')
+                set_ingest_state(cursor, failed, 'failed')
+            skipped.clear()
+            failed.clear()
+
+        try:
+            for msg_id, details in fetch_message_details(service, 'me', msg_ids):
+                if cancelled():
+                    return
+                counts['fetched'] += 1
+                report('fetching')
+                if not details:
+                    failed.append(msg_id)
+                    continue
+                if not is_sync_candidate(details):
+                    skipped.append(msg_id)
+                    continue
                 message_datetime = utils.parsedate_to_datetime(details['Date'])
                 # Ensure message_datetime is timezone-aware
                 if message_datetime.tzinfo is None:
@@ -302,99 +1204,185 @@ def load_emails():
                 
                 # Skip if email is from before this month
                 if message_datetime < first_day_of_month:
+                    skipped.append(msg_id)
                     continue
 
-                mail_from = details.get('From', '').lower()
-                mail_cc = details.get('Cc')
-                mail_subject = details.get('Subject')
-                mail_body = details.get('Body')
+                yield {
+                    'msg_id': msg_id,
+                    'from': details.get('From', '').lower(),
+                    'cc': details.get('Cc'),
+                    'subject': details.get('Subject'),
+                    'date': message_datetime,
+                    'labels': details.get('Labels'),
+                    'body': details.get('Body'),
+                }
+                if len(skipped) + len(failed) >= SKIPPED_FLUSH_SIZE:
+                    record_states()
+        finally:
+            record_states()
 
-                full_email = summerize_email(mail_from, mail_cc, mail_subject, message_datetime, mail_body)
-                insert_email_record(full_email, index, cursor)
-                
-                print(f"(EMAILS LOADER): Canara Bank Email # {i} is detected and inserted: ({message_datetime}), ({mail_subject}).")
-                i += 1
-                emails_processed += 1
+    emails_processed = 0
+    pending = []  # (full_email, email) pairs waiting to be embedded and written together
+    checkpointed = time.monotonic()
 
-        terminate_meta_store(conn)
-        faiss.write_index(index, INDEX_NAME)
-        print(f"(EMAILS LOADER): Vector store and metadata saved. Processed {emails_processed} emails (max: {max_emails}).")
-        
-        # Update last checked time to current time
+    def store_batch():
+        # Rows and their 'stored' state commit together; the index file catches up at checkpoints
+        with conn:
+            insert_email_records(pending, index, cursor)
+            set_ingest_state(cursor, [email['msg_id'] for _, email in pending], 'stored')
+        counts['indexed'] += len(pending)
+        pending.clear()
+
+    # Listing and fetching each get a thread; summarizing runs on its own pool and
+    # embedding and indexing on this thread, which owns the write connection
+    listed = prefetch(new_ids(), PIPELINE_QUEUE_SIZE, name='sync-list')
+    fetched = prefetch(candidate_emails(listed), PIPELINE_QUEUE_SIZE, name='sync-fetch')
+    prepared = prepare_emails(fetched, cursor)
+    try:
+        for email, full_email in prepared:
+            counts['summarized'] += 1
+            pending.append((full_email, email))
+            if len(pending) >= INGEST_BATCH_SIZE:
+                store_batch()
+                if time.monotonic() - checkpointed >= CHECKPOINT_SECONDS:
+                    report('checkpointing')
+                    checkpoint_index(index, conn, cursor)
+                    checkpointed = time.monotonic()
+            report('summarizing')
+            
+            print(f"(EMAILS LOADER): Canara Bank Email # {i} is detected and queued: ({email['date']}), ({email['subject']}).")
+            i += 1
+            emails_processed += 1
+            if cancelled():
+                break
+    finally:
+        # Stops the upstream stages when the loop ends early; each closes the one before it
+        prepared.close()
+        fetched.close()
+
+    was_cancelled = cancelled()
+    # The historyId is only advanced together with the last batch it covers
+    if not was_cancelled and not listing['failed']:
+        set_setting(cursor, 'history_id', str(history_id))
+    store_batch()
+    report('saving')
+
+    if emails_processed or emails_deleted or embedder_changed or emails_recovered or legacy_dropped:
+        index = maybe_promote_index(index)
+        checkpoint_index(index, conn, cursor)
+        # Hand the fresh index to the query engine instead of making it re-read the file
+        get_retrieval_engine().install_index(index)
+        # New mail can change any answer
+        answer_cache.clear()
+    terminate_meta_store(conn)
+    print(f"(EMAILS LOADER): Sync {'cancelled' if was_cancelled else 'complete'}. "
+          f"Added {emails_processed} emails, removed {emails_deleted}.")
+    
+    # Update last checked time to current time
+    if not was_cancelled and not listing['failed']:
         update_last_checked_time(datetime.now(timezone.utc))
+    return {'added': emails_processed, 'removed': emails_deleted, 'cancelled': was_cancelled}
+
+answer_cache = AnswerCache(ANSWER_CACHE_SIZE, ANSWER_CACHE_TTL, ANSWER_CACHE_THRESHOLD)
+
+def lookup_cached_answer(question):
+    """ Returns (cache key, (messages, reply) or None) for the first question of a conversation. """
+    with span('answer_cache.lookup') as s:
+        embedding = get_embedding(normalize_question(question))[0]
+        generation = get_retrieval_engine().current_generation()
+        cached = answer_cache.lookup(embedding, generation)
+        s.set(hit=cached is not None)
+    if cached is None:
+        return (embedding, generation), None
+    cached_messages, reply = cached
+    messages = [dict(m) for m in cached_messages]
+    messages[-2]["content"] = question  # The history should show what this user actually asked
+    return (embedding, generation), (messages, reply)
+
+def store_cached_answer(cache_key, messages, reply):
+    embedding, generation = cache_key
+    answer_cache.store(embedding, ([dict(m) for m in messages], reply), generation)
+
+def prepare_messages(question, messages=None):
+    """ Return the message list to send for question, retrieving emails when a new conversation starts. """
+    if messages is not None:
+        # Rolling window: old turns fall off so every follow-up costs a bounded prompt
+        with span('prompt.build', follow_up=True, history=len(messages)):
+            return trim_history(messages + [{"role": "user", "content": question}], HISTORY_TOKEN_BUDGET)
+
+    retrieved_emails = Vector_Search(question)
+    with span('prompt.build', follow_up=False) as s:
+        related_emails = pack_emails(retrieved_emails, CONTEXT_TOKEN_BUDGET)
+        s.set(emails=len(related_emails))
+        return build_prompt(question, related_emails)
+
+def build_prompt(question, related_emails):
+    system_content = (
+        "You are an AI assistant with access to a collection of emails. "
+        "Below, you'll find the most relevant emails retrieved for the user's question. "
+        "Your job is to answer the question based on the provided emails. "
+        "If you cannot find the answer, please politely inform the user. "
+        "Answer in a very short brief, and informative manner."
+    )
 
+    local_timezone = get_localzone()
+    
+    context = f"Today's Datetime is {datetime.now(local_timezone)}\n\n"
+    for i, email in enumerate(related_emails):
+        context += f"Email({i+1}):\n\n{email}\n\n"
+    
+    return [
+        {"role": "system", "content": system_content + "\n\n" + context},
+        {"role": "user", "content": question}
+    ]
+
+def check_client():
+    # The client itself is created lazily, on the first call that needs it
+    if not GROQ_API_KEY:
+        raise ValueError("Groq client not properly initialized - API key missing or invalid")
+
+def error_conversation(question, messages, error):
+    print(f"DEBUG: Critical error in ask_question: {str(error)}")
+    print(f"DEBUG: Traceback: {traceback.format_exc()}")
+    
+    error_message = f"I apologize, but I encountered a system error while processing your request. Error details: {str(error)}"
+    
+    if messages is None:
+        messages = [
+            {"role": "system", "content": "Error occurred"},
+            {"role": "user", "content": question},
+            {"role": "assistant", "content": error_message}
+        ]
+    else:
+        messages.append({"role": "user", "content": question})
+        messages.append({"role": "assistant", "content": error_message})
+    
+    return messages, error_message
+
+@traced('ask_question')
 def ask_question(question, messages=None):
     try:
-        print(f"DEBUG: Starting ask_question with question: {question}")
-        print(f"DEBUG: GROQ_API_KEY set: {'Yes' if GROQ_API_KEY else 'No'}")
-        print(f"DEBUG: client initialized: {'Yes' if client else 'No'}")
-        
-        # Check if client is properly initialized
-        if not client or not GROQ_API_KEY:
-            raise ValueError("Groq client not properly initialized - API key missing or invalid")
-        
+        check_client()
+        cache_key = None
         if messages is None:
-            print("DEBUG: New conversation started")
-            try:
-                related_emails = Vector_Search(question)
-                print(f"DEBUG: Found {len(related_emails)} related emails")
-            except Exception as e:
-                print(f"DEBUG: Error in Vector_Search: {str(e)}")
-                raise
-                
-            system_content = (
-                "You are an AI assistant with access to a collection of emails. "
-                "Below, you'll find the most relevant emails retrieved for the user's question. "
-                "Your job is to answer the question based on the provided emails. "
-                "If you cannot find the answer, please politely inform the user. "
-                "Answer in a very short brief, and informative manner."
-            )
-
-            local_timezone = get_localzone()
-            
-            context = f"Today's Datetime is {datetime.now(local_timezone)}\n\n"
-            for i, email in enumerate(related_emails):
-                context += f"Email({i+1}):\n\n{email}\n\n"
-            
-            messages = [
-                {"role": "system", "content": system_content + "\n\n" + context},
-                {"role": "user", "content": question}
-            ]
-            
-            print("DEBUG: Preparing to call Groq API for new conversation")
-        else:
-            print("DEBUG: Follow-up question in existing conversation")
-            print(f"DEBUG: Message history length: {len(messages)}")
-            # Just add the new user question to existing messages
-            messages_to_send = messages + [{"role": "user", "content": question}]
-            print("DEBUG: Preparing to call Groq API with conversation history")
+            cache_key, cached = lookup_cached_answer(question)
+            if cached:
+                return cached
+        api_messages = prepare_messages(question, messages)
+        reply_ok = False
         
         # Make the API call
         try:
-            print("DEBUG: Calling Groq API...")
-            
-            # For new conversation
-            if messages and len(messages) > 1 and "user" in messages[-1]["role"]:
-                # If last message is from user, we need to append the new question
-                api_messages = messages
-            elif messages is None:
-                # First question in conversation
-                api_messages = messages
-            else:
-                # Follow-up question
-                api_messages = messages + [{"role": "user", "content": question}]
-            
-            print(f"DEBUG: API messages structure: {[m['role'] for m in api_messages]}")
-            
-            response = client.chat.completions.create(
-                model="llama-3.3-70b-versatile",
-                messages=api_messages,
-                temperature=0.3,
-                max_tokens=1000
-            )
-            
-            print("DEBUG: API call completed")
-            print(f"DEBUG: Response type: {type(response)}")
+            with span('llm.call', model="llama-3.3-70b-versatile", messages=len(api_messages)) as s:
+                response = get_client().chat.completions.create(
+                    model="llama-3.3-70b-versatile",
+                    messages=api_messages,
+                    temperature=0.3,
+                    max_tokens=1000
+                )
+                usage = getattr(response, 'usage', None)
+                if usage:
+                    s.set(prompt_tokens=usage.prompt_tokens, completion_tokens=usage.completion_tokens)
             
             # Carefully check the response structure
             if response is None:
@@ -407,11 +1395,10 @@ def ask_question(question, messages=None):
                 print("DEBUG: Response.choices is empty")
                 assistant_reply = "I apologize, but I received an empty response from the language model."
             else:
-                print(f"DEBUG: Found {len(response.choices)} choices in response")
                 # Access the message content safely
                 try:
                     assistant_reply = response.choices[0].message.content
-                    print(f"DEBUG: Successfully extracted reply: {assistant_reply[:50]}...")
+                    reply_ok = bool(assistant_reply)
                 except Exception as content_error:
                     print(f"DEBUG: Error extracting message content: {str(content_error)}")
                     print(f"DEBUG: Response structure: {response}")
@@ -422,34 +1409,70 @@ def ask_question(question, messages=None):
             assistant_reply = "I apologize, but there was an error connecting to the language model. Please check your API key and internet connection."
         
         # Update message history
-        if messages is None:
-            messages = [
-                {"role": "system", "content": system_content + "\n\n" + context},
-                {"role": "user", "content": question},
-                {"role": "assistant", "content": assistant_reply}
-            ]
-        else:
-            messages.append({"role": "user", "content": question})
-            messages.append({"role": "assistant", "content": assistant_reply})
+        messages = api_messages + [{"role": "assistant", "content": assistant_reply}]
+        if cache_key is not None and reply_ok:
+            store_cached_answer(cache_key, messages, assistant_reply)
         
-        print("DEBUG: Returning successful response")
         return messages, assistant_reply
         
     except Exception as e:
-        import traceback
-        print(f"DEBUG: Critical error in ask_question: {str(e)}")
-        print(f"DEBUG: Traceback: {traceback.format_exc()}")
-        
-        error_message = f"I apologize, but I encountered a system error while processing your request. Error details: {str(e)}"
-        
+        return error_conversation(question, messages, e)
+
+@traced('ask_question_stream')
+def ask_question_stream(question, messages=None, on_token=None):
+    """ Streaming variant of ask_question.
+
+    on_token(text) is called with each piece of the reply as soon as it arrives, so callers
+    can render it incrementally. Returns (messages, full reply) like ask_question.
+    """
+    try:
+        check_client()
+        cache_key = None
         if messages is None:
-            messages = [
-                {"role": "system", "content": "Error occurred"},
-                {"role": "user", "content": question},
-                {"role": "assistant", "content": error_message}
-            ]
-        else:
-            messages.append({"role": "user", "content": question})
-            messages.append({"role": "assistant", "content": error_message})
-        
-        return messages, error_message 
+            cache_key, cached = lookup_cached_answer(question)
+            if cached:
+                if on_token:
+                    on_token(cached[1])
+                return cached
+        api_messages = prepare_messages(question, messages)
+
+        pieces = []
+        reply_ok = False
+        try:
+            with span('llm.call', model="llama-3.3-70b-versatile", messages=len(api_messages), stream=True) as s:
+                started = time.perf_counter()
+                stream = get_client().chat.completions.create(
+                    model="llama-3.3-70b-versatile",
+                    messages=api_messages,
+                    temperature=0.3,
+                    max_tokens=1000,
+                    stream=True
+                )
+                for chunk in stream:
+                    if not chunk.choices:
+                        continue
+                    token = chunk.choices[0].delta.content
+                    if token:
+                        if not pieces:
+                            s.set(first_token_ms=round((time.perf_counter() - started) * 1000, 3))
+                        pieces.append(token)
+                        if on_token:
+                            on_token(token)
+                s.set(chunks=len(pieces))
+            assistant_reply = "".join(pieces)
+            reply_ok = bool(assistant_reply)
+            if not assistant_reply:
+                assistant_reply = "I apologize, but I received an empty response from the language model."
+        except Exception as api_error:
+            print(f"DEBUG: API call error: {str(api_error)}")
+            error_reply = "I apologize, but there was an error connecting to the language model. Please check your API key and internet connection."
+            # Keep whatever already reached the user, followed by the error
+            assistant_reply = "".join(pieces) + ("\n\n" if pieces else "") + error_reply
+
+        messages = api_messages + [{"role": "assistant", "content": assistant_reply}]
+        if cache_key is not None and reply_ok:
+            store_cached_answer(cache_key, messages, assistant_reply)
+        return messages, assistant_reply
+
+    except Exception as e:
+        return error_conversation(question, messages, e)
@@ -0,0 +1,64 @@
+# Standard library imports
+from collections import OrderedDict
+import re
+import threading
+import time
+
+# Third-party library imports
+import numpy as np
+
+def normalize_question(question):
+    """ Lowercase, collapse whitespace and drop trailing punctuation before embedding. """
+    return re.sub(r"\s+", " ", question.lower()).strip().rstrip("?!. ")
+
+class AnswerCache:
+    """ Semantic cache of first-turn answers, keyed by question embedding and index generation.
+
+    A lookup hits when a stored question's embedding has cosine similarity >= threshold with
+    the new one, was answered against the same index generation and is younger than ttl
+    seconds. Embeddings must be L2-normalized. Least recently used entries are evicted
+    beyond max_entries, and everything is dropped when the generation moves on.
+    """
+
+    def __init__(self, max_entries=256, ttl=900, threshold=0.95):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.threshold = threshold
+        self.generation = None
+        self.entries = OrderedDict()  # key -> (embedding, value, created)
+        self.lock = threading.Lock()
+        self.next_key = 0
+
+    def _sync_generation(self, generation):
+        if generation != self.generation:
+            self.entries.clear()
+            self.generation = generation
+
+    def lookup(self, embedding, generation):
+        with self.lock:
+            self._sync_generation(generation)
+            now = time.monotonic()
+            for key in [k for k, (_, _, created) in self.entries.items() if now - created > self.ttl]:
+                del self.entries[key]
+            if not self.entries:
+                return None
+            keys = list(self.entries)
+            matrix = np.vstack([self.entries[k][0] for k in keys])
+            similarities = matrix @ embedding
+            best = int(np.argmax(similarities))
+            if similarities[best] < self.threshold:
+                return None
+            self.entries.move_to_end(keys[best])
+            return self.entries[keys[best]][1]
+
+    def store(self, embedding, value, generation):
+        with self.lock:
+            self._sync_generation(generation)
+            self.entries[self.next_key] = (np.asarray(embedding, dtype=np.float32), value, time.monotonic())
+            self.next_key += 1
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
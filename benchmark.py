@@ -0,0 +1,288 @@
+""" End-to-end ingestion and retrieval benchmark against the local fake Gmail and LLM servers.
+
+Usage:
+    python benchmark.py                                       # 1k and 10k mailboxes
+    python benchmark.py --scales 1000,10000,100000,1000000
+    python benchmark.py --compare old_results.json            # flag regressions against an earlier run
+
+Each scale runs in its own subprocess and scratch directory, so peak RSS and file sizes
+belong to that scale alone. Up to --ingest-limit messages of the synthetic mailbox go
+through the real sync path (fake Gmail -> load_emails -> fake LLM), followed by an
+incremental sync of 1% new mail. The rest of the mailbox is dated over the previous year,
+summarized locally with fallback_summary and bulk-inserted, because a million LLM round
+trips would measure the fake server rather than this code. Search and ask latency are then
+measured over the whole index.
+
+Results go to --output as JSON; with --compare, metrics that got worse by more than
+--tolerance are listed and the exit status is 1.
+"""
+import argparse
+from datetime import datetime, timezone
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from fake_gmail import FakeGmailServer, synthetic_mailbox
+from fake_llm import FakeLLMServer
+
+SEARCH_QUERIES = [
+    "How much money was debited from my account?",
+    "What is my current account balance?",
+    "Show the credits to my account this month",
+    "Any transactions above INR 10,000 last week?",
+    "What did amazon send me recently?",
+    "Emails about the project meeting schedule",
+    "Was anything debited on 25/09/2025?",
+    "UPI payments in the past 3 days",
+]
+
+# (section, metric, True if higher is better)
+TRACKED_METRICS = [
+    ('ingest', 'messages_per_second', True),
+    ('incremental', 'seconds', False),
+    ('bulk_index', 'emails_per_second', True),
+    ('search', 'p95_ms', False),
+    ('filtered_search', 'p95_ms', False),
+    ('ask', 'p95_ms', False),
+    ('memory', 'peak_rss_mb', False),
+    ('storage', 'index_bytes', False),
+]
+
+def peak_rss_mb():
+    """ Peak resident set size of this process, or None where it can't be read. """
+    try:
+        import resource
+    except ImportError:
+        # Windows: fall back to psutil's peak working set, if it's installed
+        try:
+            import psutil
+        except ImportError:
+            return None
+        info = psutil.Process().memory_info()
+        return getattr(info, 'peak_wset', info.rss) / 1e6
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1e6 if sys.platform == 'darwin' else peak / 1e3  # bytes on macOS, KiB elsewhere
+
+def latency_summary(latencies_ms):
+    latencies = np.array(latencies_ms)
+    return {
+        'count': len(latencies),
+        'mean_ms': float(latencies.mean()),
+        'p50_ms': float(np.percentile(latencies, 50)),
+        'p95_ms': float(np.percentile(latencies, 95)),
+        'p99_ms': float(np.percentile(latencies, 99)),
+    }
+
+def throughput(count, seconds, unit):
+    return {'count': count, 'seconds': seconds, f'{unit}_per_second': count / seconds if seconds else 0.0}
+
+def timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+def bulk_index(R, messages, batch_size=1000):
+    """ Summarize messages with fallback_summary and insert them straight into the store and index. """
+    index = R.get_index()
+    conn, cursor = R.initiate_meta_store()
+    index = R.ensure_index_embedder(index, cursor)
+    batch = []
+    for message in messages:
+        details = R.parse_message_details(message)
+        date = datetime.fromtimestamp(int(message['internalDate']) / 1000, timezone.utc)
+        email = {'msg_id': message['id'], 'from': details.get('From', '').lower(), 'cc': details.get('Cc'),
+                 'subject': details.get('Subject'), 'date': date, 'labels': details.get('Labels'),
+                 'body_hash': R.text_hash(details.get('Body') or '')}
+        text = R.fallback_summary(email['from'], email['cc'], email['subject'], date, details.get('Body'))
+        batch.append((text, email))
+        if len(batch) >= batch_size:
+            with conn:
+                R.insert_email_records(batch, index, cursor)
+            batch = []
+    with conn:
+        R.insert_email_records(batch, index, cursor)
+    R.terminate_meta_store(conn)
+    index = R.maybe_promote_index(index)
+    R.faiss.write_index(index, R.INDEX_NAME)
+    R.get_retrieval_engine().install_index(index)
+
+def run_scale(scale, args):
+    """ Benchmark one mailbox size in the current process and return its results dict. """
+    workdir = tempfile.mkdtemp(prefix=f"ragrag-bench-{scale}-")
+    os.chdir(workdir)
+    llm = FakeLLMServer(latency=args.llm_latency, seed=args.seed).start()
+    os.environ['GROQ_BASE_URL'] = llm.base_url
+    os.environ.setdefault('GROQ_API_KEY', 'benchmark')
+    # Imported only now, so the index and database it creates land in workdir
+    import RAG_Gmail as R
+
+    now = time.time()
+    month_start = datetime.now(timezone.utc).replace(day=1, hour=0, minute=0, second=0, microsecond=0).timestamp()
+    ingest_count = min(scale, args.ingest_limit)
+    incremental_count = max(10, ingest_count // 100)
+    mailbox = list(synthetic_mailbox(ingest_count + incremental_count, month_start + 60, now, seed=args.seed))
+    gmail = FakeGmailServer(mailbox[:ingest_count], latency=args.gmail_latency, seed=args.seed).start()
+    service = gmail.build_service()
+    R.authenticate_gmail = lambda: service
+    results = {'scale': scale, 'workdir': workdir}
+
+    try:
+        sync, seconds = timed(R.load_emails)
+        results['ingest'] = dict(throughput(ingest_count, seconds, 'messages'), indexed=sync['added'],
+                                 llm_calls=llm.stats['requests'], gmail_http_calls=gmail.stats['http_calls'])
+
+        for message in mailbox[ingest_count:]:
+            gmail.add_message(message)
+        llm_calls = llm.stats['requests']
+        sync, seconds = timed(R.load_emails)
+        results['incremental'] = dict(throughput(incremental_count, seconds, 'messages'), indexed=sync['added'],
+                                      llm_calls=llm.stats['requests'] - llm_calls)
+
+        bulk_count = scale - ingest_count
+        if bulk_count > 0:
+            year_ago = month_start - 365 * 86400
+            older = (dict(message, id=f"old{message['id']}")
+                     for message in synthetic_mailbox(bulk_count, year_ago, month_start, seed=args.seed + 1))
+            _, seconds = timed(bulk_index, R, older)
+            results['bulk_index'] = throughput(bulk_count, seconds, 'emails')
+
+        engine = R.get_retrieval_engine()
+        R.Vector_Search(SEARCH_QUERIES[0])  # Warm the index and the embedder
+        unfiltered, filtered = [], []
+        for i in range(args.queries):
+            query = SEARCH_QUERIES[i % len(SEARCH_QUERIES)]
+            _, seconds = timed(R.Vector_Search, query, filters={})
+            unfiltered.append(seconds * 1000)
+            _, seconds = timed(R.Vector_Search, query)
+            filtered.append(seconds * 1000)
+        results['search'] = latency_summary(unfiltered)
+        results['filtered_search'] = latency_summary(filtered)
+
+        asks = []
+        for i in range(args.asks):
+            R.answer_cache.clear()  # Measure the full retrieve-and-generate path, not cache hits
+            _, seconds = timed(R.ask_question, SEARCH_QUERIES[i % len(SEARCH_QUERIES)])
+            asks.append(seconds * 1000)
+        results['ask'] = latency_summary(asks)
+
+        index = engine.get_index()
+        results['storage'] = {
+            'index_vectors': int(index.ntotal),
+            'index_kind': R.index_kind(index),
+            'index_bytes': os.path.getsize(R.INDEX_NAME),
+            'db_bytes': sum(os.path.getsize(path) for path in (R.DB_FILE, R.DB_FILE + '-wal') if os.path.exists(path)),
+        }
+        results['memory'] = {'peak_rss_mb': peak_rss_mb()}
+    finally:
+        gmail.stop()
+        llm.stop()
+    return results
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+def compare(current, previous, tolerance):
+    """ Print metric changes per scale and return the list of regressions beyond tolerance. """
+    previous_runs = {run['scale']: run for run in previous.get('runs', [])}
+    regressions = []
+    print(f"{'scale':>9}  {'metric':<34}{'before':>14}{'after':>14}{'change':>9}")
+    for run in current['runs']:
+        old = previous_runs.get(run['scale'])
+        if not old:
+            continue
+        for section, metric, higher_is_better in TRACKED_METRICS:
+            before = (old.get(section) or {}).get(metric)
+            after = (run.get(section) or {}).get(metric)
+            if not before or after is None:
+                continue
+            change = (after - before) / before
+            worse = -change if higher_is_better else change
+            flag = '  REGRESSION' if worse > tolerance else ''
+            print(f"{run['scale']:>9}  {section + '.' + metric:<34}{before:>14.2f}{after:>14.2f}{change:>+9.1%}{flag}")
+            if flag:
+                regressions.append((run['scale'], section, metric, change))
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scales', default='1000,10000', help="Comma-separated mailbox sizes")
+    parser.add_argument('--ingest-limit', type=int, default=10000, help="Messages synced through fake Gmail and the LLM")
+    parser.add_argument('--queries', type=int, default=200, help="Vector_Search calls per scale")
+    parser.add_argument('--asks', type=int, default=50, help="ask_question calls per scale")
+    parser.add_argument('--gmail-latency', type=float, default=0.0, help="Seconds added to every fake Gmail call")
+    parser.add_argument('--llm-latency', type=float, default=0.0, help="Seconds added to every fake LLM call")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default='benchmark_results.json')
+    parser.add_argument('--compare', help="Earlier results file to check for regressions")
+    parser.add_argument('--tolerance', type=float, default=0.2, help="Allowed fractional slowdown before flagging")
+    parser.add_argument('--verbose', action='store_true', help="Show the pipeline's own log output")
+    parser.add_argument('--keep-workdir', action='store_true', help="Keep each scale's index and database for inspection")
+    parser.add_argument('--run-one', type=int, help=argparse.SUPPRESS)
+    parser.add_argument('--result-file', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_one:
+        results = run_scale(args.run_one, args)
+        with open(args.result_file, 'w') as f:
+            json.dump(results, f)
+        if not args.keep_workdir:
+            os.chdir(tempfile.gettempdir())
+            shutil.rmtree(results['workdir'], ignore_errors=True)
+        return
+
+    runs = []
+    for scale in [int(s) for s in args.scales.split(',') if s.strip()]:
+        print(f"Benchmarking {scale} messages...", flush=True)
+        with tempfile.NamedTemporaryFile(suffix='.json', delete=False) as f:
+            result_file = f.name
+        command = [sys.executable, os.path.abspath(__file__), '--run-one', str(scale), '--result-file', result_file,
+                   '--ingest-limit', str(args.ingest_limit), '--queries', str(args.queries), '--asks', str(args.asks),
+                   '--gmail-latency', str(args.gmail_latency), '--llm-latency', str(args.llm_latency),
+                   '--seed', str(args.seed)] + (['--keep-workdir'] if args.keep_workdir else [])
+        output = None if args.verbose else subprocess.DEVNULL
+        completed = subprocess.run(command, stdout=output, stderr=None if args.verbose else subprocess.PIPE, text=True)
+        if completed.returncode != 0:
+            print(f"Scale {scale} failed:\n{completed.stderr or ''}")
+            continue
+        with open(result_file) as f:
+            run = json.load(f)
+        os.remove(result_file)
+        runs.append(run)
+        print(f"  ingest {run['ingest']['messages_per_second']:.1f} msg/s, "
+              f"search p95 {run['search']['p95_ms']:.2f} ms, filtered p95 {run['filtered_search']['p95_ms']:.2f} ms, "
+              f"ask p95 {run['ask']['p95_ms']:.2f} ms, index {run['storage']['index_bytes'] / 1e6:.1f} MB, "
+              f"peak RSS {run['memory']['peak_rss_mb'] or 0:.0f} MB")
+
+    results = {
+        'generated': datetime.now(timezone.utc).isoformat(),
+        'commit': git_commit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'config': {name: os.getenv(name) for name in ('EMBEDDER', 'EMBEDDING_DIM', 'INDEX_MODE', 'RETRIEVAL_MODE')},
+        'runs': runs,
+    }
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            previous = json.load(f)
+        regressions = compare(results, previous, args.tolerance)
+        if regressions:
+            print(f"{len(regressions)} metric(s) regressed by more than {args.tolerance:.0%}.")
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
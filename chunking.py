@@ -0,0 +1,48 @@
+# Local modules
+from summarizer import TOKEN_PIECE_PATTERN
+
+def piece_tokens(piece):
+    # Same per-piece count as summarizer.estimate_tokens
+    return (len(piece) + 3) // 4
+
+def chunk_text(text, size, overlap):
+    """ Split text into windows of about `size` tokens, each repeating the last `overlap` tokens of the one before.
+
+    Windows are cut between word and punctuation pieces and keep the text's own spacing.
+    A single piece longer than `size` becomes a window of its own.
+    """
+    pieces = [(match.start(), match.end(), piece_tokens(match.group())) for match in TOKEN_PIECE_PATTERN.finditer(text or '')]
+    chunks = []
+    start = 0
+    while start < len(pieces):
+        end, tokens = start, 0
+        while end < len(pieces) and (end == start or tokens + pieces[end][2] <= size):
+            tokens += pieces[end][2]
+            end += 1
+        chunks.append(text[pieces[start][0]:pieces[end - 1][1]])
+        if end == len(pieces):
+            break
+        # Step back from the window's end until `overlap` tokens are repeated, always moving forward
+        next_start, repeated = end, 0
+        while next_start - 1 > start and repeated + pieces[next_start - 1][2] <= overlap:
+            next_start -= 1
+            repeated += pieces[next_start][2]
+        start = next_start
+    return chunks
+
+def create_chunk_schema(cursor):
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS Chunks (
+            vector_id INTEGER PRIMARY KEY,
+            gmail_id TEXT NOT NULL,
+            position INTEGER NOT NULL,
+            text TEXT NOT NULL
+        )
+        ''')
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_chunks_gmail_id ON Chunks (gmail_id, position)")
+    # A deleted or re-indexed email takes its chunks with it
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS metadata_chunks_delete AFTER DELETE ON Metadata BEGIN
+            DELETE FROM Chunks WHERE gmail_id = old.gmail_id;
+        END
+        ''')
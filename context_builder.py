@@ -0,0 +1,65 @@
+# Standard library imports
+import re
+
+# Local modules
+from summarizer import estimate_tokens
+
+WORD_PATTERN = re.compile(r"\w+")
+
+def shingles(text, size=3):
+    """ Set of overlapping word n-grams, used to spot near-identical emails. """
+    words = WORD_PATTERN.findall((text or '').lower())
+    if len(words) < size:
+        return {' '.join(words)}
+    return {' '.join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+def jaccard(a, b):
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+def pack_emails(emails, budget, dedupe_threshold=0.95):
+    """ Pick emails, best-ranked first, until the token budget is spent.
+
+    An email whose word shingles overlap an already-picked one by dedupe_threshold or more
+    is treated as a duplicate and skipped. So are emails too large for what is left of the
+    budget, so that smaller, lower-ranked ones can still fit.
+    """
+    picked, picked_shingles = [], []
+    remaining = budget
+    for email in emails:
+        cost = estimate_tokens(email)
+        if cost > remaining:
+            continue
+        email_shingles = shingles(email)
+        if any(jaccard(email_shingles, other) >= dedupe_threshold for other in picked_shingles):
+            continue
+        picked.append(email)
+        picked_shingles.append(email_shingles)
+        remaining -= cost
+    return picked
+
+def message_tokens(message):
+    return estimate_tokens(message['content']) + 4  # Role and framing overhead
+
+def trim_history(messages, budget):
+    """ Keep the system message and the most recent turns that fit in budget tokens.
+
+    Older turns are dropped whole, so the kept history always starts at a user message.
+    The latest message is kept even if it alone exceeds the budget.
+    """
+    system = [m for m in messages[:1] if m['role'] == 'system']
+    turns = messages[len(system):]
+    remaining = budget - sum(message_tokens(m) for m in system)
+
+    kept = []
+    for message in reversed(turns):
+        cost = message_tokens(message)
+        if kept and cost > remaining:
+            break
+        kept.append(message)
+        remaining -= cost
+    kept.reverse()
+    while len(kept) > 1 and kept[0]['role'] != 'user':
+        kept.pop(0)
+    return system + kept
@@ -0,0 +1,156 @@
+# Standard library imports
+from functools import lru_cache
+import hashlib
+import math
+import os
+import re
+
+# Third-party library imports
+import numpy as np
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:[.,/:-][a-z0-9]+)*")
+STOP_WORDS = frozenset(
+    "a an and are as at be by for from has have if in is it of on or that the this to was were will with "
+    "you your we our".split()
+)
+
+class Embedder:
+    """ Turns a batch of texts into an (n, dim) float32 matrix of L2-normalized rows. """
+
+    name = 'base'
+
+    def __init__(self, dim):
+        self.dim = dim
+
+    def encode(self, texts):
+        raise NotImplementedError
+
+    def embed(self, texts):
+        vectors = np.asarray(self.encode(list(texts)), dtype=np.float32).reshape(-1, self.dim)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return np.ascontiguousarray(vectors / norms, dtype=np.float32)
+
+@lru_cache(maxsize=200000)
+def _feature_slot(feature, dim):
+    """ Map a feature to a (bucket, sign) pair with a process-independent hash. """
+    value = int.from_bytes(hashlib.blake2b(feature.encode('utf-8'), digest_size=8).digest(), 'big')
+    return value % dim, 1.0 if value >> 63 else -1.0
+
+class HashingEmbedder(Embedder):
+    """ Offline, CPU-only encoder: signed feature hashing of word unigrams and bigrams.
+
+    Term counts are log-scaled (1 + log tf) so boilerplate repeated across an email doesn't
+    dominate, and exact tokens such as amounts, dates and account suffixes are kept intact.
+    """
+
+    name = 'hashing-v1'
+
+    def features(self, text):
+        tokens = [t for t in TOKEN_PATTERN.findall(text.lower()) if t not in STOP_WORDS]
+        counts = {}
+        for i, token in enumerate(tokens):
+            counts[token] = counts.get(token, 0) + 1
+            if i:
+                bigram = tokens[i - 1] + ' ' + token
+                counts[bigram] = counts.get(bigram, 0) + 1
+        return counts
+
+    def encode(self, texts):
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for feature, count in self.features(text or '').items():
+                bucket, sign = _feature_slot(feature, self.dim)
+                vectors[row, bucket] += sign * (1.0 + math.log(count))
+        return vectors
+
+class OnnxEmbedder(Embedder):
+    """ Sentence-transformer style ONNX model loaded from a local directory.
+
+    The directory must hold model.onnx and tokenizer.json. Token embeddings are mean-pooled.
+    Needs the optional onnxruntime and tokenizers packages.
+    """
+
+    def __init__(self, dim, model_dir, max_length=256):
+        super().__init__(dim)
+        try:
+            import onnxruntime
+            from tokenizers import Tokenizer
+        except ImportError as e:
+            raise ImportError("EMBEDDER=onnx needs the onnxruntime and tokenizers packages") from e
+        self.name = f"onnx:{os.path.basename(os.path.normpath(model_dir))}"
+        self.session = onnxruntime.InferenceSession(os.path.join(model_dir, 'model.onnx'),
+                                                    providers=['CPUExecutionProvider'])
+        self.tokenizer = Tokenizer.from_file(os.path.join(model_dir, 'tokenizer.json'))
+        self.tokenizer.enable_truncation(max_length)
+        self.tokenizer.enable_padding()
+        self.input_names = {i.name for i in self.session.get_inputs()}
+
+    def encode(self, texts):
+        encodings = self.tokenizer.encode_batch(texts)
+        inputs = {
+            'input_ids': np.array([e.ids for e in encodings], dtype=np.int64),
+            'attention_mask': np.array([e.attention_mask for e in encodings], dtype=np.int64),
+            'token_type_ids': np.array([e.type_ids for e in encodings], dtype=np.int64),
+        }
+        inputs = {name: value for name, value in inputs.items() if name in self.input_names}
+        token_embeddings = self.session.run(None, inputs)[0]
+        mask = inputs['attention_mask'][..., None].astype(np.float32)
+        pooled = (token_embeddings * mask).sum(axis=1) / np.maximum(mask.sum(axis=1), 1e-9)
+        if pooled.shape[1] != self.dim:
+            raise ValueError(f"ONNX model produces {pooled.shape[1]}-dim vectors; set EMBEDDING_DIM={pooled.shape[1]}")
+        return pooled
+
+def create_embedder(dim):
+    """ Build the embedder selected by the EMBEDDER setting (hashing or onnx). """
+    backend = os.getenv('EMBEDDER', 'hashing')
+    if backend == 'hashing':
+        return HashingEmbedder(dim)
+    if backend == 'onnx':
+        return OnnxEmbedder(dim, os.getenv('ONNX_MODEL_DIR', 'models/embedder'))
+    raise ValueError(f"Unknown EMBEDDER: {backend}")
+
+# Embedding cache, stored next to the email metadata
+def text_hash(text):
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+def create_embedding_cache_schema(cursor):
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS EmbeddingCache (
+            embedder TEXT NOT NULL,
+            text_hash TEXT NOT NULL,
+            vector BLOB NOT NULL,
+            PRIMARY KEY (embedder, text_hash)
+        )
+        ''')
+
+def embed_with_cache(embedder, texts, cursor=None):
+    """ Embed texts, reusing cached vectors and only running the embedder on unseen texts. """
+    texts = list(texts)
+    if not texts:
+        return np.empty((0, embedder.dim), dtype=np.float32)
+    if cursor is None:
+        return embedder.embed(texts)
+
+    hashes = [text_hash(text) for text in texts]
+    cached = {}
+    unique_hashes = list(dict.fromkeys(hashes))
+    for start in range(0, len(unique_hashes), 500):
+        chunk = unique_hashes[start:start + 500]
+        placeholders = ",".join("?" * len(chunk))
+        cursor.execute(f"SELECT text_hash, vector FROM EmbeddingCache WHERE embedder=? AND text_hash IN ({placeholders})",
+                       [embedder.name] + chunk)
+        for digest, blob in cursor.fetchall():
+            cached[digest] = np.frombuffer(blob, dtype=np.float32)
+
+    missing = {}
+    for text, digest in zip(texts, hashes):
+        if digest not in cached:
+            missing.setdefault(digest, text)
+    if missing:
+        vectors = embedder.embed(missing.values())
+        cursor.executemany("INSERT OR REPLACE INTO EmbeddingCache (embedder, text_hash, vector) VALUES (?, ?, ?)",
+                           [(embedder.name, digest, vector.tobytes()) for digest, vector in zip(missing, vectors)])
+        cached.update(zip(missing, vectors))
+
+    return np.vstack([cached[digest] for digest in hashes]).astype(np.float32)
@@ -0,0 +1,414 @@
+""" A local, in-process fake of the Gmail API for offline benchmarking and development.
+
+The server speaks enough of the Gmail REST surface (getProfile, messages.list, messages.get,
+history.list and the batch endpoint) for the real googleapiclient client to drive it unchanged:
+
+    server = FakeGmailServer([make_message('m1', 'alerts@canarabank.com', 'Alert', 'Hello')])
+    server.start()
+    service = server.build_service()
+    ...
+    server.stop()
+
+latency adds a delay to every HTTP call and error_rate makes that fraction of message
+fetches answer 429, so throughput and backoff can be measured without a network.
+"""
+import base64
+from email import utils
+from email.parser import BytesParser
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import random
+import threading
+import time
+import urllib.parse
+import uuid
+
+HISTORY_TYPES = {'messagesAdded': 'messageAdded', 'messagesDeleted': 'messageDeleted'}
+
+def _b64(text):
+    return base64.urlsafe_b64encode(text.encode('utf-8')).decode('ascii')
+
+def make_message(msg_id, sender, subject, body, date=None, html_body=None, cc=None, labels=('INBOX',)):
+    """ Build a message in the shape messages.get(format='full') returns. """
+    date = date or time.time()
+    headers = [
+        {'name': 'From', 'value': sender},
+        {'name': 'Subject', 'value': subject},
+        {'name': 'Date', 'value': utils.formatdate(date, localtime=False)},
+    ]
+    if cc:
+        headers.append({'name': 'Cc', 'value': cc})
+    if html_body is None:
+        payload = {'mimeType': 'text/plain', 'headers': headers, 'body': {'data': _b64(body)}}
+    else:
+        payload = {
+            'mimeType': 'multipart/alternative',
+            'headers': headers,
+            'body': {'size': 0},
+            'parts': [
+                {'mimeType': 'text/plain', 'body': {'data': _b64(body)}},
+                {'mimeType': 'text/html', 'body': {'data': _b64(html_body)}},
+            ],
+        }
+    return {
+        'id': msg_id,
+        'threadId': msg_id,
+        'labelIds': list(labels),
+        'internalDate': str(int(date * 1000)),
+        'payload': payload,
+    }
+
+BANK_SENDER = 'canarabank@canarabank.com'
+BANK_ALERT_TEMPLATE = (
+    "Dear Customer,\r\n\r\nThanking you for banking with Canara Bank.\r\n\r\n"
+    "An amount of INR {amount:,.2f} has been {direction} to your account XXXX{account} on {day}. "
+    "Total Avail.bal INR {balance:,.2f}.To report fraud & stop further debit SMS SUSPECT to 56161.\r\n\r\n"
+    "If not done by you, send an email from your registered e-mail id with the subject line as per "
+    "below format to reportfraud@canarabank.com to block the respective channels or account."
+)
+NEWSLETTER_SENDERS = ['deals@amazon.in', 'newsletter@swiggy.in', 'noreply@linkedin.com', 'updates@zomato.com']
+PERSONAL_SENDERS = ['ravi.kumar@gmail.com', 'priya.s@outlook.com', 'team-lead@company.example']
+FILLER_WORDS = ('meeting project invoice update schedule offer discount order delivery payment '
+                'report review travel ticket booking reminder weekend family dinner budget').split()
+
+def synthetic_message(number, rng, date):
+    """ One realistic message: mostly Canara alerts (plain or multipart), plus HTML newsletters and personal mail. """
+    msg_id = f"syn{number:08d}"
+    kind = rng.random()
+    if kind < 0.6:
+        direction = 'DEBITED' if rng.random() < 0.8 else 'CREDITED'
+        body = BANK_ALERT_TEMPLATE.format(amount=rng.uniform(10, 50000), direction=direction,
+                                          account=rng.choice(['1854', '4421']),
+                                          day=time.strftime('%d/%m/%Y', time.gmtime(date)),
+                                          balance=rng.uniform(100, 200000))
+        html_body = None
+        if rng.random() < 0.3:
+            html_body = "<html><body><table><tr><td>" + body.replace("\r\n", "<br>") + "</td></tr></table></body></html>"
+        return make_message(msg_id, f"Canara Bank <{BANK_SENDER}>", 'ATM/IMPS/UPI Transaction Alert', body,
+                            date=date, html_body=html_body)
+    words = ' '.join(rng.choice(FILLER_WORDS) for _ in range(rng.randint(40, 400)))
+    if kind < 0.85:
+        html_body = f"<html><head><style>td {{color: #333}}</style></head><body><h1>Offers</h1><p>{words}</p></body></html>"
+        return make_message(msg_id, rng.choice(NEWSLETTER_SENDERS), f"Your weekly {rng.choice(FILLER_WORDS)} digest",
+                            words, date=date, html_body=html_body, labels=('INBOX', 'CATEGORY_PROMOTIONS'))
+    return make_message(msg_id, rng.choice(PERSONAL_SENDERS), f"Re: {rng.choice(FILLER_WORDS)}", words, date=date,
+                        cc=rng.choice([None, 'friend@gmail.com']), labels=('INBOX', 'IMPORTANT'))
+
+def synthetic_mailbox(count, start, end, seed=0):
+    """ Yield count synthetic messages dated evenly between the start and end timestamps, oldest first. """
+    rng = random.Random(seed)
+    step = (end - start) / max(1, count)
+    for number in range(count):
+        yield synthetic_message(number, rng, start + number * step)
+
+def discovery_document(root_url):
+    """ A trimmed Gmail v1 discovery document pointing at root_url. """
+    user_id = {'type': 'string', 'required': True, 'location': 'path'}
+    return {
+        'kind': 'discovery#restDescription',
+        'discoveryVersion': 'v1',
+        'id': 'gmail:v1',
+        'name': 'gmail',
+        'version': 'v1',
+        'rootUrl': root_url,
+        'servicePath': '',
+        'baseUrl': root_url,
+        'batchPath': 'batch/gmail/v1',
+        'parameters': {'alt': {'type': 'string', 'location': 'query', 'default': 'json'}},
+        'schemas': {
+            'Message': {'id': 'Message', 'type': 'object'},
+            'ListMessagesResponse': {
+                'id': 'ListMessagesResponse',
+                'type': 'object',
+                'properties': {
+                    'messages': {'type': 'array', 'items': {'$ref': 'Message'}},
+                    'nextPageToken': {'type': 'string'},
+                    'resultSizeEstimate': {'type': 'integer'},
+                },
+            },
+            'Profile': {'id': 'Profile', 'type': 'object'},
+            'ListHistoryResponse': {
+                'id': 'ListHistoryResponse',
+                'type': 'object',
+                'properties': {
+                    'history': {'type': 'array', 'items': {'type': 'object'}},
+                    'nextPageToken': {'type': 'string'},
+                    'historyId': {'type': 'string'},
+                },
+            },
+        },
+        'resources': {'users': {
+            'methods': {'getProfile': {
+                'id': 'gmail.users.getProfile',
+                'path': 'gmail/v1/users/{userId}/profile',
+                'httpMethod': 'GET',
+                'parameters': {'userId': user_id},
+                'parameterOrder': ['userId'],
+                'response': {'$ref': 'Profile'},
+            }},
+            'resources': {'history': {'methods': {'list': {
+                'id': 'gmail.users.history.list',
+                'path': 'gmail/v1/users/{userId}/history',
+                'httpMethod': 'GET',
+                'parameters': {
+                    'userId': user_id,
+                    'startHistoryId': {'type': 'string', 'location': 'query'},
+                    'historyTypes': {'type': 'string', 'location': 'query', 'repeated': True},
+                    'pageToken': {'type': 'string', 'location': 'query'},
+                    'maxResults': {'type': 'integer', 'location': 'query'},
+                },
+                'parameterOrder': ['userId'],
+                'response': {'$ref': 'ListHistoryResponse'},
+            }}}, 'messages': {'methods': {
+            'list': {
+                'id': 'gmail.users.messages.list',
+                'path': 'gmail/v1/users/{userId}/messages',
+                'httpMethod': 'GET',
+                'parameters': {
+                    'userId': user_id,
+                    'q': {'type': 'string', 'location': 'query'},
+                    'pageToken': {'type': 'string', 'location': 'query'},
+                    'maxResults': {'type': 'integer', 'location': 'query'},
+                },
+                'parameterOrder': ['userId'],
+                'response': {'$ref': 'ListMessagesResponse'},
+            },
+            'get': {
+                'id': 'gmail.users.messages.get',
+                'path': 'gmail/v1/users/{userId}/messages/{id}',
+                'httpMethod': 'GET',
+                'parameters': {
+                    'userId': user_id,
+                    'id': {'type': 'string', 'required': True, 'location': 'path'},
+                    'format': {'type': 'string', 'location': 'query'},
+                },
+                'parameterOrder': ['userId', 'id'],
+                'response': {'$ref': 'Message'},
+            },
+        }}}}},
+    }
+
+class FakeGmailServer:
+    """ Serves a fixed mailbox over HTTP on localhost. """
+
+    def __init__(self, messages=(), page_size=100, latency=0.0, error_rate=0.0, seed=0, port=0):
+        self.messages = {}
+        self.order = []  # Newest first, like Gmail's listing
+        self.page_size = page_size
+        self.latency = latency
+        self.error_rate = error_rate
+        self.lock = threading.Lock()
+        self.random = random.Random(seed)
+        self.stats = {'http_calls': 0, 'batch_calls': 0, 'message_gets': 0, 'throttled': 0}
+        self.history_id = 1
+        self.history = []  # (history_id, 'messagesAdded' or 'messagesDeleted', msg_id)
+        self.history_floor = 1  # history.list answers 404 for older start ids
+        for message in messages:
+            self.add_message(message)
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', port), self._handler_class())
+        self.httpd.daemon_threads = True
+        self.thread = None
+
+    @property
+    def root_url(self):
+        return f"http://127.0.0.1:{self.httpd.server_address[1]}/"
+
+    def add_message(self, message):
+        with self.lock:
+            self.history_id += 1
+            message = dict(message, historyId=str(self.history_id))
+            if message['id'] not in self.messages:
+                self.order.insert(0, message['id'])
+                self.history.append((self.history_id, 'messagesAdded', message['id']))
+            self.messages[message['id']] = message
+
+    def delete_message(self, msg_id):
+        with self.lock:
+            if self.messages.pop(msg_id, None) is not None:
+                self.order.remove(msg_id)
+                self.history_id += 1
+                self.history.append((self.history_id, 'messagesDeleted', msg_id))
+
+    def expire_history(self):
+        """ Drop all history records, as Gmail does after about a week. """
+        with self.lock:
+            self.history = []
+            self.history_floor = self.history_id
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def build_service(self):
+        """ A googleapiclient Gmail service object talking to this server. """
+        import httplib2
+        from googleapiclient.discovery import build_from_document
+        return build_from_document(discovery_document(self.root_url), http=httplib2.Http())
+
+    # Request handling
+    def _count(self, key):
+        with self.lock:
+            self.stats[key] += 1
+
+    def _throttle(self):
+        with self.lock:
+            throttled = self.random.random() < self.error_rate
+            if throttled:
+                self.stats['throttled'] += 1
+        return throttled
+
+    def handle(self, method, path, query, body=b'', content_type=''):
+        """ Route one request. Returns (status, content_type, body bytes). """
+        parts = [p for p in path.split('/') if p]
+        if method == 'POST' and parts == ['batch', 'gmail', 'v1']:
+            self._count('batch_calls')
+            return self._handle_batch(body, content_type)
+        if method != 'GET' or parts[:3] != ['gmail', 'v1', 'users']:
+            return self._json(404, {'error': {'code': 404, 'message': 'Not Found'}})
+        route = parts[4:]
+        if route == ['profile']:
+            with self.lock:
+                return self._json(200, {'emailAddress': parts[3], 'messagesTotal': len(self.messages),
+                                        'historyId': str(self.history_id)})
+        if route == ['history']:
+            return self._handle_history(query)
+        if route == ['messages']:
+            return self._handle_list(query)
+        if len(route) == 2 and route[0] == 'messages':
+            return self._handle_get(urllib.parse.unquote(route[1]))
+        return self._json(404, {'error': {'code': 404, 'message': 'Not Found'}})
+
+    def _json(self, status, payload):
+        return status, 'application/json; charset=UTF-8', json.dumps(payload).encode('utf-8')
+
+    def _handle_list(self, query):
+        start = int(query.get('pageToken', ['0'])[0] or 0)
+        size = min(int(query.get('maxResults', [self.page_size])[0]), self.page_size)
+        with self.lock:
+            ids = self.order[start:start + size]
+            total = len(self.order)
+            page = [{'id': i, 'threadId': self.messages[i]['threadId']} for i in ids]
+        response = {'resultSizeEstimate': total}
+        if page:
+            response['messages'] = page
+        if start + size < total:
+            response['nextPageToken'] = str(start + size)
+        return self._json(200, response)
+
+    def _handle_history(self, query):
+        start_id = int(query.get('startHistoryId', ['0'])[0])
+        offset = int(query.get('pageToken', ['0'])[0] or 0)
+        size = min(int(query.get('maxResults', [self.page_size])[0]), self.page_size)
+        types = set(query.get('historyTypes', [])) or {'messageAdded', 'messageDeleted'}
+        with self.lock:
+            if start_id < self.history_floor:
+                return self._json(404, {'error': {'code': 404, 'message': 'Requested entity was not found.'}})
+            records = [r for r in self.history if r[0] > start_id and HISTORY_TYPES[r[1]] in types]
+            current = str(self.history_id)
+        page = records[offset:offset + size]
+        response = {'historyId': current}
+        if page:
+            response['history'] = [{'id': str(h), kind: [{'message': {'id': msg_id, 'threadId': msg_id}}]}
+                                   for h, kind, msg_id in page]
+        if offset + size < len(records):
+            response['nextPageToken'] = str(offset + size)
+        return self._json(200, response)
+
+    def _handle_get(self, msg_id):
+        self._count('message_gets')
+        if self._throttle():
+            return self._json(429, {'error': {'code': 429, 'message': 'Rate Limit Exceeded'}})
+        with self.lock:
+            message = self.messages.get(msg_id)
+        if message is None:
+            return self._json(404, {'error': {'code': 404, 'message': 'Requested entity was not found.'}})
+        return self._json(200, message)
+
+    def _handle_batch(self, body, content_type):
+        envelope = BytesParser().parsebytes(b'Content-Type: ' + content_type.encode() + b'\r\n\r\n' + body)
+        boundary = uuid.uuid4().hex
+        chunks = []
+        for part in envelope.get_payload():
+            request_text = part.get_payload()
+            request_line = request_text.lstrip().split('\n', 1)[0].strip()
+            method, target, _ = request_line.split(' ', 2)
+            parsed = urllib.parse.urlparse(target)
+            status, part_type, part_body = self.handle(method, parsed.path, urllib.parse.parse_qs(parsed.query))
+            content_id = part['Content-ID'].strip()
+            chunks.append(
+                f"--{boundary}\r\nContent-Type: application/http\r\nContent-ID: <response-{content_id[1:]}\r\n\r\n"
+                f"HTTP/1.1 {status} {'OK' if status == 200 else 'Error'}\r\nContent-Type: {part_type}\r\n\r\n"
+                + part_body.decode('utf-8') + "\r\n"
+            )
+        payload = ''.join(chunks) + f"--{boundary}--\r\n"
+        return 200, f'multipart/mixed; boundary={boundary}', payload.encode('utf-8')
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def _respond(self, method):
+                server._count('http_calls')
+                if server.latency:
+                    time.sleep(server.latency)
+                parsed = urllib.parse.urlparse(self.path)
+                length = int(self.headers.get('Content-Length') or 0)
+                body = self.rfile.read(length) if length else b''
+                status, content_type, payload = server.handle(
+                    method, parsed.path, urllib.parse.parse_qs(parsed.query), body,
+                    self.headers.get('Content-Type', ''))
+                self.send_response(status)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def do_GET(self):
+                self._respond('GET')
+
+            def do_POST(self):
+                self._respond('POST')
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+def main():
+    """ Measure MessageFetcher throughput against the fake server. """
+    import argparse
+    import httplib2
+    from gmail_fetch import MessageFetcher
+
+    parser = argparse.ArgumentParser(description="Offline Gmail fetch throughput benchmark")
+    parser.add_argument('--messages', type=int, default=1000)
+    parser.add_argument('--latency', type=float, default=0.05, help="Seconds added to every HTTP call")
+    parser.add_argument('--error-rate', type=float, default=0.02, help="Fraction of gets answered with 429")
+    parser.add_argument('--batch-size', type=int, default=50)
+    args = parser.parse_args()
+
+    messages = [make_message(f"msg{i:08d}", 'alerts@canarabank.com', 'Transaction Alert', f"Amount INR {i}.00")
+                for i in range(args.messages)]
+    server = FakeGmailServer(messages, latency=args.latency, error_rate=args.error_rate).start()
+    try:
+        service = server.build_service()
+        ids = [m['id'] for m in messages]
+        for workers in (1, 2, 4, 8):
+            fetcher = MessageFetcher(service, batch_size=args.batch_size, workers=workers,
+                                     backoff_base=0.05, http_factory=httplib2.Http)
+            start = time.perf_counter()
+            fetched = sum(1 for _, message in fetcher.fetch(ids) if message)
+            elapsed = time.perf_counter() - start
+            print(f"workers={workers:<2} fetched={fetched:<7} {elapsed:7.2f}s  {fetched / elapsed:9.1f} msg/s")
+    finally:
+        server.stop()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+""" A local stub of the OpenAI-compatible chat-completions endpoint Groq serves.
+
+Point the Groq client at it through GROQ_BASE_URL, which the SDK reads by default:
+
+    server = FakeLLMServer(latency=0.5).start()
+    os.environ['GROQ_BASE_URL'] = server.base_url
+
+Replies are deterministic: the reply echoes the start of the last user message, so
+summaries and answers stay recognisable in benchmarks. latency is added to every call
+(time to first token), token_delay between streamed chunks, and error_rate makes that
+fraction of calls answer 429. Requests with "stream": true get server-sent events.
+"""
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import random
+import threading
+import time
+import uuid
+
+def _tokens(text):
+    return len(text or '') // 4 + 1
+
+class FakeLLMServer:
+    """ Serves POST .../chat/completions on localhost. """
+
+    def __init__(self, latency=0.0, error_rate=0.0, reply_chars=400, token_delay=0.0, seed=0, port=0):
+        self.latency = latency
+        self.token_delay = token_delay
+        self.error_rate = error_rate
+        self.reply_chars = reply_chars
+        self.lock = threading.Lock()
+        self.random = random.Random(seed)
+        self.stats = {'requests': 0, 'throttled': 0, 'prompt_tokens': 0, 'completion_tokens': 0}
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', port), self._handler_class())
+        self.httpd.daemon_threads = True
+        self.thread = None
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.httpd.server_address[1]}"
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def reply_for(self, messages):
+        user_messages = [m.get('content') or '' for m in messages if m.get('role') == 'user']
+        last = ' '.join((user_messages[-1] if user_messages else '').split())
+        return f"<Email Start>\n{last[:self.reply_chars]}\n<Email End>"
+
+    def complete(self, request):
+        """ Returns (status, payload dict) for one chat-completions request. """
+        with self.lock:
+            self.stats['requests'] += 1
+            if self.random.random() < self.error_rate:
+                self.stats['throttled'] += 1
+                return 429, {'error': {'message': 'Rate limit reached', 'type': 'tokens', 'code': 'rate_limit_exceeded'}}
+        messages = request.get('messages', [])
+        content = self.reply_for(messages)
+        prompt_tokens = sum(_tokens(m.get('content')) for m in messages)
+        completion_tokens = _tokens(content)
+        with self.lock:
+            self.stats['prompt_tokens'] += prompt_tokens
+            self.stats['completion_tokens'] += completion_tokens
+        return 200, {
+            'id': f"chatcmpl-{uuid.uuid4().hex}",
+            'object': 'chat.completion',
+            'created': int(time.time()),
+            'model': request.get('model', 'fake'),
+            'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': content}, 'finish_reason': 'stop'}],
+            'usage': {'prompt_tokens': prompt_tokens, 'completion_tokens': completion_tokens,
+                      'total_tokens': prompt_tokens + completion_tokens},
+        }
+
+    def stream_chunks(self, payload):
+        """ Split a completion into chat.completion.chunk events, a few words per chunk. """
+        content = payload['choices'][0]['message']['content']
+        words = content.split(' ')
+        base = {'id': payload['id'], 'object': 'chat.completion.chunk', 'created': payload['created'],
+                'model': payload['model']}
+        for i in range(0, len(words), 3):
+            text = ' '.join(words[i:i + 3]) + (' ' if i + 3 < len(words) else '')
+            yield dict(base, choices=[{'index': 0, 'delta': {'content': text}, 'finish_reason': None}])
+        yield dict(base, choices=[{'index': 0, 'delta': {}, 'finish_reason': 'stop'}],
+                   x_groq={'usage': payload['usage']})
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def _send_json(self, status, payload, headers=()):
+                body = json.dumps(payload).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                for name, value in headers:
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length') or 0)
+                request = json.loads(self.rfile.read(length) or b'{}')
+                if not self.path.rstrip('/').endswith('/chat/completions'):
+                    self._send_json(404, {'error': {'message': 'Not Found'}})
+                    return
+                if server.latency:
+                    time.sleep(server.latency)
+                status, payload = server.complete(request)
+                if status != 200 or not request.get('stream'):
+                    self._send_json(status, payload, [('retry-after', '1')] if status == 429 else ())
+                    return
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/event-stream')
+                self.send_header('Connection', 'close')
+                self.end_headers()
+                self.close_connection = True
+                for chunk in server.stream_chunks(payload):
+                    self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode('utf-8'))
+                    self.wfile.flush()
+                    if server.token_delay:
+                        time.sleep(server.token_delay)
+                self.wfile.write(b"data: [DONE]\n\n")
+                self.wfile.flush()
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
@@ -0,0 +1,142 @@
+# Standard library imports
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+import random
+import threading
+import time
+
+# Third-party library imports
+import google_auth_httplib2
+import httplib2
+from googleapiclient.errors import HttpError
+
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+
+def _status_of(error):
+    if isinstance(error, HttpError):
+        return int(error.resp.status)
+    return None
+
+def _retry_after(error):
+    """ Seconds requested by a Retry-After header, if the server sent one. """
+    if isinstance(error, HttpError):
+        value = error.resp.get('retry-after')
+        if value and value.isdigit():
+            return int(value)
+    return None
+
+class MessageFetcher:
+    """ Fetches full Gmail messages with batch HTTP requests and a bounded worker pool.
+
+    Ids are split into batches of up to batch_size (Gmail allows 100 per batch call, but
+    recommends 50 to stay clear of rate limits). Batches run on `workers` threads, each with
+    its own HTTP connection since httplib2 is not thread-safe. Requests that fail with
+    429/5xx are retried with exponential backoff and jitter. fetch() yields results in
+    input order, a batch at a time, as soon as the next batch in line has finished.
+    """
+
+    def __init__(self, service, user_id='me', batch_size=50, workers=4, max_retries=5,
+                 backoff_base=1.0, backoff_cap=32.0, http_factory=None):
+        self.service = service
+        self.user_id = user_id
+        self.batch_size = max(1, min(batch_size, 100))
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.http_factory = http_factory or self._default_http_factory()
+        # Without a way to open more connections, threads would share one httplib2 object
+        self.workers = max(1, workers) if self.http_factory else 1
+        self._local = threading.local()
+
+    def _default_http_factory(self):
+        http = getattr(self.service, '_http', None)
+        if isinstance(http, google_auth_httplib2.AuthorizedHttp):
+            return lambda: google_auth_httplib2.AuthorizedHttp(http.credentials, http=httplib2.Http())
+        if type(http) is httplib2.Http:
+            return httplib2.Http  # Unauthenticated, e.g. the local fake server
+        return None
+
+    def _http(self):
+        if self.http_factory is None:
+            return None  # Use the service's own connection
+        if not hasattr(self._local, 'http'):
+            self._local.http = self.http_factory()
+        return self._local.http
+
+    def _sleep_before_retry(self, attempt, error=None):
+        delay = _retry_after(error)
+        if delay is None:
+            delay = min(self.backoff_cap, self.backoff_base * (2 ** attempt))
+            delay *= random.uniform(0.5, 1.0)
+        time.sleep(delay)
+
+    def _execute_batch(self, msg_ids, results, errors):
+        batch = self.service.new_batch_http_request()
+
+        def callback(request_id, response, exception):
+            if exception is None:
+                results[request_id] = response
+            else:
+                errors[request_id] = exception
+
+        for msg_id in msg_ids:
+            request = self.service.users().messages().get(userId=self.user_id, id=msg_id, format='full')
+            batch.add(request, callback=callback, request_id=msg_id)
+        batch.execute(http=self._http())
+
+    def fetch_batch(self, msg_ids):
+        """ Fetch one batch of ids, retrying throttled ones. Returns [(msg_id, message or None)]. """
+        results = {}
+        pending = list(dict.fromkeys(msg_ids))
+        for attempt in range(self.max_retries + 1):
+            errors = {}
+            try:
+                self._execute_batch(pending, results, errors)
+            except (HttpError, httplib2.HttpLib2Error, OSError) as error:
+                # The whole batch call failed (throttled, 5xx or a dropped connection)
+                status = _status_of(error)
+                if (status is not None and status not in RETRYABLE_STATUSES) or attempt == self.max_retries:
+                    print(f"(EMAILS LOADER): Batch fetch failed: {error}")
+                    break
+                self._sleep_before_retry(attempt, error)
+                continue
+
+            retryable = [msg_id for msg_id, error in errors.items() if _status_of(error) in RETRYABLE_STATUSES]
+            for msg_id, error in errors.items():
+                if msg_id not in retryable:
+                    print(f"(EMAILS LOADER): Failed to fetch message {msg_id}: {error}")
+            if not retryable or attempt == self.max_retries:
+                break
+            pending = retryable
+            self._sleep_before_retry(attempt, errors[retryable[0]])
+
+        return [(msg_id, results.get(msg_id)) for msg_id in msg_ids]
+
+    def fetch(self, msg_ids):
+        """ Yield (msg_id, message or None) for every id, in input order.
+
+        msg_ids can be any iterable, such as a listing that is still paging in; ids are
+        pulled from it one batch at a time, only as fast as batches get fetched.
+        """
+        ids = iter(msg_ids)
+        batches = iter(lambda: list(islice(ids, self.batch_size)), [])
+        if self.workers == 1:
+            for batch in batches:
+                yield from self.fetch_batch(batch)
+            return
+
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            in_flight = deque()
+            exhausted = False
+            # Keep a bounded number of batches ahead of the consumer
+            while True:
+                while not exhausted and len(in_flight) < self.workers * 2:
+                    batch = next(batches, None)
+                    if batch is None:
+                        exhausted = True
+                        break
+                    in_flight.append(pool.submit(self.fetch_batch, batch))
+                if not in_flight:
+                    return
+                yield from in_flight.popleft().result()
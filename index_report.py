@@ -0,0 +1,127 @@
+""" Recall-vs-latency report for the approximate index modes, measured against the flat baseline.
+
+Usage:
+    python index_report.py                      # vectors from the current index_email.index
+    python index_report.py --synthetic 100000   # random vectors, for sizing a deployment
+    python index_report.py --synthetic 5000 --check-removal
+
+Each row shows recall@k against exact search, per-query latency and index size, so a
+value for INDEX_MODE / NPROBE / EF_SEARCH can be picked for the .env file.
+
+--check-removal instead deletes and re-adds a sample of vectors in every mode, the way
+deleted messages and recover_stored_emails do, and exits with status 1 if any mode fails.
+"""
+import argparse
+import sys
+import time
+
+import faiss
+import numpy as np
+
+from RAG_Gmail import EMBEDDING_DIM, build_index, configure_search, get_index, index_vectors, remove_vectors
+
+NPROBE_GRID = [1, 4, 8, 16, 32, 64]
+EF_SEARCH_GRID = [16, 32, 64, 128, 256]
+
+def load_vectors(synthetic):
+    if synthetic:
+        rng = np.random.default_rng(0)
+        vectors = rng.standard_normal((synthetic, EMBEDDING_DIM)).astype(np.float32)
+        return vectors, np.arange(synthetic, dtype=np.int64)
+    return index_vectors(get_index())
+
+def make_queries(vectors, count, seed=0):
+    """ Perturbed copies of stored vectors, so queries look like the data being searched. """
+    rng = np.random.default_rng(seed)
+    picks = rng.choice(len(vectors), size=min(count, len(vectors)), replace=False)
+    noise = rng.standard_normal((len(picks), vectors.shape[1])).astype(np.float32)
+    return vectors[picks] + 0.05 * np.std(vectors) * noise
+
+def time_search(index, queries, k):
+    """ Search one query at a time, as Vector_Search does, and return (labels, per-query ms). """
+    labels = np.empty((len(queries), k), dtype=np.int64)
+    latencies = []
+    for row, query in enumerate(queries):
+        start = time.perf_counter()
+        _, found = index.search(query.reshape(1, -1), k)
+        latencies.append((time.perf_counter() - start) * 1000)
+        labels[row] = found[0]
+    return labels, np.array(latencies)
+
+def recall_at_k(found, truth):
+    hits = sum(len(set(f[f >= 0]) & set(t[t >= 0])) for f, t in zip(found, truth))
+    return hits / max(1, int((truth >= 0).sum()))
+
+def report(vectors, ids, queries, k):
+    flat = build_index('flat', vectors, ids)
+    truth, flat_latency = time_search(flat, queries, k)
+    rows = [('flat', '-', 1.0, flat_latency, faiss.serialize_index(flat).nbytes)]
+
+    for mode, grid, knob in (('ivf_flat', NPROBE_GRID, 'nprobe'), ('ivf_pq', NPROBE_GRID, 'nprobe'),
+                             ('hnsw', EF_SEARCH_GRID, 'efSearch')):
+        try:
+            index = build_index(mode, vectors, ids)
+        except RuntimeError as e:
+            print(f"Skipping {mode}: {e}")
+            continue
+        size = faiss.serialize_index(index).nbytes
+        for value in grid:
+            if knob == 'nprobe':
+                configure_search(index, nprobe=value)
+            else:
+                configure_search(index, ef_search=value)
+            found, latency = time_search(index, queries, k)
+            rows.append((mode, f"{knob}={value}", recall_at_k(found, truth), latency, size))
+
+    print(f"{len(vectors)} vectors, {len(queries)} queries, k={k}")
+    print(f"{'mode':<10}{'setting':<14}{'recall@k':>10}{'p50 ms':>10}{'p95 ms':>10}{'size MB':>10}")
+    for mode, setting, recall, latency, size in rows:
+        print(f"{mode:<10}{setting:<14}{recall:>10.3f}{np.percentile(latency, 50):>10.3f}"
+              f"{np.percentile(latency, 95):>10.3f}{size / 1e6:>10.1f}")
+
+def check_removal(vectors, ids, k, count=50):
+    """ Remove and re-add `count` ids in every mode. Returns the modes that failed. """
+    rng = np.random.default_rng(1)
+    picks = rng.choice(len(ids), size=min(count, len(ids) // 2), replace=False)
+    removed = ids[picks]
+    failed = []
+    for mode in ('flat', 'ivf_flat', 'ivf_pq', 'hnsw'):
+        try:
+            index = build_index(mode, vectors, ids)
+        except RuntimeError as e:
+            print(f"Skipping {mode}: {e}")
+            continue
+        problems = []
+        if remove_vectors(index, removed) != len(removed) or index.ntotal != len(ids) - len(removed):
+            problems.append("remove count")
+        _, found = index.search(vectors[picks], k)
+        if np.isin(found, removed).any():
+            problems.append("removed ids still returned")
+        # Recovery removes ids that may or may not be present, then adds them back
+        remove_vectors(index, removed)
+        index.add_with_ids(vectors[picks], removed)
+        if sorted(index_vectors(index)[1]) != sorted(ids):
+            problems.append("ids after re-adding")
+        print(f"{mode:<10}{'ok' if not problems else 'FAILED: ' + ', '.join(problems)}")
+        if problems:
+            failed.append(mode)
+    return failed
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--synthetic', type=int, default=0, help="Use N random vectors instead of the saved index")
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--k', type=int, default=25)
+    parser.add_argument('--check-removal', action='store_true', help="Check deletes and re-adds in every mode")
+    args = parser.parse_args()
+
+    vectors, ids = load_vectors(args.synthetic)
+    if not len(vectors):
+        print("The index is empty; run the app to load emails or pass --synthetic N.")
+        return
+    if args.check_removal:
+        sys.exit(1 if check_removal(vectors, ids, args.k) else 0)
+    report(vectors, ids, make_queries(vectors, args.queries), args.k)
+
+if __name__ == "__main__":
+    main()
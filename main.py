@@ -2,18 +2,22 @@ import customtkinter as ctk
 import tkinter as tk
 from tkinter import messagebox
 import threading
-import speech_recognition as sr
-import pyttsx3
-from RAG_Gmail import load_emails, ask_question
+import queue
+from tracing import span
 import time
 import random
 from datetime import datetime, timedelta
-import matplotlib.pyplot as plt
-import seaborn as sns
-import pandas as pd
-from PIL import Image, ImageTk
 import io
-import numpy as np
+import hashlib
+import json
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from itertools import accumulate
+
+# Heavy dependencies are imported on first use, so the window is up before they load:
+# RAG_Gmail (faiss, Gmail and Groq clients) on the sync and query worker threads, the
+# plotting stack on a background thread, and the voice and TTS stacks when first used.
+# Run startup_profile.py to see what importing this module costs.
 
 # Set CustomTkinter appearance
 ctk.set_appearance_mode("dark")
@@ -23,6 +27,113 @@ print("Starting application...")  # Debug print
 
 # CustomTkinter handles modern styling automatically, so we can remove the AnimatedButton class
 
+def load_chart_modules():
+    import matplotlib
+    matplotlib.use('Agg')  # Charts are rendered to PNG images, never to a matplotlib window
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+    import pandas as pd
+    from PIL import Image
+    return plt, sns, pd, Image
+
+CHART_FIGSIZE = (4.2, 2.2)  # Inches
+CHART_DPI = 100
+CHART_CACHE_SIZE = 16
+chart_cache = OrderedDict()  # chart key -> rendered PIL image, least recently used first
+chart_lock = threading.Lock()  # pyplot keeps global state, so charts render one at a time
+
+def chart_key(days, credits, debits, colors):
+    """ Hash of everything the rendered chart depends on: the data series, its size and the theme. """
+    payload = json.dumps([days, credits, debits, CHART_FIGSIZE, CHART_DPI, sorted(colors.items())])
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+def render_chart(days, credits, debits, colors):
+    """ Return (key, PIL image) of the weekly chart, drawing it only if it isn't cached.
+
+    Runs on a worker thread; the Tk thread only turns the image into a PhotoImage.
+    """
+    key = chart_key(days, credits, debits, colors)
+    with chart_lock, span('chart.render') as s:
+        image = chart_cache.get(key)
+        s.set(cached=image is not None)
+        if image is not None:
+            chart_cache.move_to_end(key)
+            return key, image
+        
+        # Importing matplotlib, seaborn and pandas takes seconds, so it only happens on a cache miss
+        plt, sns, pd, Image = load_chart_modules()
+        
+        # Set up matplotlib/seaborn styling
+        plt.style.use('dark_background')
+        sns.set_palette([colors['text_success'], colors['accent']])
+        
+        # Create compact figure with dark theme
+        fig, ax = plt.subplots(figsize=CHART_FIGSIZE, facecolor=colors['surface'])
+        try:
+            ax.set_facecolor(colors['surface'])
+            
+            # Prepare data for seaborn
+            data = pd.DataFrame({
+                'Day': days * 2,
+                'Amount': credits + debits,
+                'Type': ['Credits'] * len(days) + ['Debits'] * len(days)
+            })
+            
+            # Create modern bar plot with seaborn
+            sns.barplot(data=data, x='Day', y='Amount', hue='Type', ax=ax,
+                       palette=[colors['text_success'], colors['accent']],
+                       alpha=0.9, edgecolor='white', linewidth=0.5)
+            
+            # Customize the plot with consistent colors (more compact)
+            ax.set_title('Weekly Overview', 
+                        color=colors['text'], fontsize=10, 
+                        fontfamily='monospace', pad=8)
+            
+            ax.set_xlabel('', color=colors['text'])
+            ax.set_ylabel('Amount (₹)', color=colors['text'], fontsize=9, fontfamily='monospace')
+            
+            # Style the axes
+            ax.tick_params(colors=colors['text_muted'], labelsize=8)
+            ax.grid(True, alpha=0.3, color=colors['text_muted'], linewidth=0.5)
+            
+            # Format y-axis to show rupees, in thousands once amounts are large
+            if max(credits + debits, default=0) >= 10000:
+                ax.yaxis.set_major_formatter(plt.FuncFormatter(lambda x, p: f'₹{x/1000:.0f}K'))
+            else:
+                ax.yaxis.set_major_formatter(plt.FuncFormatter(lambda x, p: f'₹{x:,.0f}'))
+            
+            # Style the legend
+            legend = ax.legend(frameon=True, facecolor=colors['surface_variant'], 
+                             edgecolor=colors['text_muted'], fontsize=8)
+            legend.get_frame().set_alpha(0.9)
+            for text in legend.get_texts():
+                text.set_color(colors['text'])
+            
+            # Remove top and right spines
+            ax.spines['top'].set_visible(False)
+            ax.spines['right'].set_visible(False)
+            ax.spines['left'].set_color(colors['text_muted'])
+            ax.spines['bottom'].set_color(colors['text_muted'])
+            
+            # Tight layout
+            plt.tight_layout()
+            
+            # Convert to image
+            buf = io.BytesIO()
+            plt.savefig(buf, format='png', facecolor=colors['surface'], 
+                       dpi=CHART_DPI, bbox_inches='tight', pad_inches=0.1)
+            buf.seek(0)
+        finally:
+            # Close the figure to free memory
+            plt.close(fig)
+        
+        image = Image.open(buf)
+        image.load()  # Decode now, while still off the Tk thread
+        chart_cache[key] = image
+        while len(chart_cache) > CHART_CACHE_SIZE:
+            chart_cache.popitem(last=False)
+    return key, image
+
 class VoiceThread(threading.Thread):
     def __init__(self, callback):
         super().__init__()
@@ -30,6 +141,7 @@ class VoiceThread(threading.Thread):
         self.daemon = True
 
     def run(self):
+        import speech_recognition as sr
         recognizer = sr.Recognizer()
         try:
             with sr.Microphone() as source:
@@ -46,12 +158,12 @@ class VoiceThread(threading.Thread):
 
 
 class MessageBubble(ctk.CTkFrame):
-    def __init__(self, parent, text, is_user=True, **kwargs):
+    def __init__(self, parent, text, is_user=True, colors=None, **kwargs):
         # Get color palette from parent
-        colors = parent.master.master.colors if hasattr(parent.master.master, 'colors') else {
+        colors = colors or (parent.master.master.colors if hasattr(parent.master.master, 'colors') else {
             'primary': '#89B4FA', 'secondary': '#313244', 'background': '#1E1E2E', 
             'text': '#CDD6F4', 'accent': '#F38BA8'
-        }
+        })
         
         super().__init__(parent, fg_color="transparent", **kwargs)
         
@@ -85,10 +197,170 @@ class MessageBubble(ctk.CTkFrame):
             wrap_length = 400
         
         # Message text with proper wrapping
-        msg_label = ctk.CTkLabel(msg_frame, text=text, text_color=text_color, 
+        self.text = text
+        self.msg_label = ctk.CTkLabel(msg_frame, text=text, text_color=text_color, 
                                font=font_config, wraplength=wrap_length, 
                                justify='left', anchor='nw')
-        msg_label.pack(padx=18, pady=12, anchor='nw')
+        self.msg_label.pack(padx=18, pady=12, anchor='nw')
+    
+    def append_text(self, text):
+        """Append streamed text to the bubble"""
+        self.set_text(self.text + text)
+    
+    def set_text(self, text):
+        self.text = text
+        self.msg_label.configure(text=text)
+
+BUBBLE_PADX = 10
+BUBBLE_PADY = 2
+
+class TranscriptEntry:
+    """One chat message, kept whether or not a bubble is currently showing it"""
+    __slots__ = ('transcript', 'text', 'is_user', 'height', 'measured_width', 'bubble', 'window')
+    
+    def __init__(self, transcript, text, is_user):
+        self.transcript = transcript
+        self.text = text
+        self.is_user = is_user
+        self.height = self.estimate_height()
+        self.measured_width = None  # Canvas width the height was measured at
+        self.bubble = None
+        self.window = None  # Canvas window item holding the bubble
+    
+    def estimate_height(self):
+        # Wrap length over the JetBrains Mono glyph width, and the bubble's fixed padding
+        chars_per_line = 40 if self.is_user else 44
+        lines = sum(max(1, -(-len(line) // chars_per_line)) for line in self.text.split('\n'))
+        return lines * 20 + 44 + 2 * BUBBLE_PADY
+    
+    def append_text(self, text):
+        """Append streamed text to the message"""
+        self.set_text(self.text + text)
+    
+    def set_text(self, text):
+        self.text = text
+        self.measured_width = None
+        if self.bubble is not None:
+            self.bubble.set_text(text)
+        else:
+            self.height = self.estimate_height()
+            self.transcript.dirty = True
+        self.transcript.schedule_render()
+
+class ChatTranscript:
+    """Chat history drawn on a canvas, with bubbles only for the messages in view.
+    
+    Every message is a TranscriptEntry holding its text and height. Bubble widgets are
+    created for entries within OVERSCAN pixels of the view and destroyed once scrolled
+    away, so long conversations keep a constant number of widgets. An entry's height is
+    estimated from its text until its bubble has been laid out, and a resize only
+    re-measures the bubbles on screen; the others are measured when scrolled to.
+    """
+    OVERSCAN = 600  # Pixels above and below the view kept as live bubbles
+    
+    def __init__(self, canvas, colors):
+        self.canvas = canvas
+        self.colors = colors
+        self.entries = []
+        self.offsets = [0]  # offsets[i] is the top of entry i, offsets[-1] the total height
+        self.live = {}  # entry index -> entry with a bubble
+        self.dirty = False  # Heights changed since offsets were computed
+        self.width = None
+        self.region = None
+        self.follow = False  # Scroll to the end on the next render
+        self.render_pending = False
+        canvas.configure(yscrollcommand=lambda first, last: self.schedule_render())
+    
+    def add(self, text, is_user):
+        entry = TranscriptEntry(self, text, is_user)
+        self.entries.append(entry)
+        self.offsets.append(self.offsets[-1] + entry.height)
+        self.scroll_to_end()
+        return entry
+    
+    def clear(self):
+        for entry in self.live.values():
+            self.release(entry)
+        self.entries, self.offsets, self.live = [], [0], {}
+        self.dirty = False
+        self.schedule_render()
+    
+    def scroll_to_end(self):
+        self.follow = True
+        self.schedule_render()
+    
+    def schedule_render(self):
+        # Scroll, resize and text events coalesce into one render when Tk is next idle
+        if not self.render_pending:
+            self.render_pending = True
+            self.canvas.after_idle(self.render)
+    
+    def render(self):
+        self.render_pending = False
+        width, height = self.canvas.winfo_width(), self.canvas.winfo_height()
+        if width <= 1:
+            return  # Not mapped yet; its first <Configure> renders again
+        if width != self.width:
+            self.width = width
+            for entry in self.live.values():
+                self.canvas.itemconfigure(entry.window, width=self.bubble_width())
+        
+        # Measuring new bubbles can move the ones below, so settle in a few passes
+        for _ in range(3):
+            if self.dirty:
+                self.layout()
+            top = max(0, self.offsets[-1] - height) if self.follow else self.canvas.canvasy(0)
+            if not self.realize(top - self.OVERSCAN, top + height + self.OVERSCAN):
+                break
+        
+        region = (0, 0, width, self.offsets[-1])
+        if region != self.region:
+            self.region = region
+            self.canvas.configure(scrollregion=region)
+        if self.follow:
+            self.follow = False
+            self.canvas.yview_moveto(1.0)
+    
+    def bubble_width(self):
+        return max(1, self.width - 2 * BUBBLE_PADX)
+    
+    def layout(self):
+        self.offsets = list(accumulate((entry.height for entry in self.entries), initial=0))
+        for index, entry in self.live.items():
+            self.canvas.coords(entry.window, BUBBLE_PADX, self.offsets[index] + BUBBLE_PADY)
+        self.dirty = False
+    
+    def realize(self, top, bottom):
+        """Keep bubbles for exactly the entries between top and bottom; True if any height changed"""
+        first = max(0, bisect_right(self.offsets, top) - 1)
+        last = min(len(self.entries), bisect_left(self.offsets, bottom))
+        for index in [index for index in self.live if not first <= index < last]:
+            self.release(self.live.pop(index))
+        
+        for index in range(first, last):
+            entry = self.entries[index]
+            if entry.bubble is None:
+                entry.bubble = MessageBubble(self.canvas, entry.text, entry.is_user, colors=self.colors)
+                entry.window = self.canvas.create_window(BUBBLE_PADX, self.offsets[index] + BUBBLE_PADY,
+                                                         window=entry.bubble, anchor='nw', width=self.bubble_width())
+                self.live[index] = entry
+        
+        unmeasured = [entry for entry in self.live.values() if entry.measured_width != self.width]
+        if not unmeasured:
+            return False
+        self.canvas.update_idletasks()  # Lay out the new bubbles so they report their height
+        for entry in unmeasured:
+            entry.measured_width = self.width
+            height = entry.bubble.winfo_reqheight() + 2 * BUBBLE_PADY
+            if height != entry.height:
+                entry.height = height
+                self.dirty = True
+        return self.dirty
+    
+    def release(self, entry):
+        self.canvas.delete(entry.window)
+        entry.bubble.destroy()
+        entry.bubble = entry.window = None
 
 class GmailAssistantUI:
     def __init__(self, root):
@@ -126,9 +398,12 @@ class GmailAssistantUI:
         # Initialize variables
         self.messages = None
         self.new_conversation = True
-        self.engine = pyttsx3.init()
+        self.engine = None  # pyttsx3 engine, created on the first spoken reply
+        self.tts_lock = threading.Lock()
         self.is_listening = False
         self.sidebar_collapsed = False
+        self.overview = None  # Last financial overview shown, reused while the sidebar is rebuilt
+        self.chart = None  # (chart key, PhotoImage) on screen
         self.sidebar_width = 350
         self.collapsed_width = 60
         
@@ -191,6 +466,14 @@ class GmailAssistantUI:
                                         text_color=self.colors['text_success'], font=self.subtitle_font)
         self.status_label.pack(side='left', padx=(0, 30), pady=20)
         
+        # Stop button, only shown while emails are syncing in the background
+        self.stop_sync_btn = ctk.CTkButton(header_content, text="Stop sync",
+                                          fg_color=self.colors['surface'], text_color=self.colors['text'],
+                                          font=("JetBrains Mono", 11, "bold"),
+                                          corner_radius=10, width=100, height=32,
+                                          hover_color=self.colors['surface_variant'],
+                                          command=self.cancel_email_sync)
+        
         # Modern new chat button with consistent palette
         new_chat_btn = ctk.CTkButton(header_content, text="+ New Chat", 
                                     fg_color=self.colors['surface'], text_color=self.colors['text'],
@@ -277,82 +560,52 @@ class GmailAssistantUI:
                 
             self.sidebar_canvas.yview_scroll(scroll_direction, "units")
     
-    def create_modern_chart(self, parent, credits, debits, days):
-        """Create a modern Seaborn chart and embed it in the sidebar"""
-        try:
-            # Set up matplotlib/seaborn styling
-            plt.style.use('dark_background')
-            sns.set_palette([self.colors['text_success'], self.colors['accent']])
-            
-            # Create compact figure with dark theme
-            fig, ax = plt.subplots(figsize=(4.2, 2.2), facecolor=self.colors['surface'])
-            ax.set_facecolor(self.colors['surface'])
-            
-            # Prepare data for seaborn
-            data = pd.DataFrame({
-                'Day': days * 2,
-                'Amount': credits + debits,
-                'Type': ['Credits'] * len(days) + ['Debits'] * len(days)
-            })
-            
-            # Create modern bar plot with seaborn
-            sns.barplot(data=data, x='Day', y='Amount', hue='Type', ax=ax,
-                       palette=[self.colors['text_success'], self.colors['accent']],
-                       alpha=0.9, edgecolor='white', linewidth=0.5)
-            
-            # Customize the plot with consistent colors (more compact)
-            ax.set_title('Weekly Overview', 
-                        color=self.colors['text'], fontsize=10, 
-                        fontfamily='monospace', pad=8)
-            
-            ax.set_xlabel('', color=self.colors['text'])
-            ax.set_ylabel('Amount (₹)', color=self.colors['text'], fontsize=9, fontfamily='monospace')
-            
-            # Style the axes
-            ax.tick_params(colors=self.colors['text_muted'], labelsize=8)
-            ax.grid(True, alpha=0.3, color=self.colors['text_muted'], linewidth=0.5)
-            
-            # Format y-axis to show rupees
-            ax.yaxis.set_major_formatter(plt.FuncFormatter(lambda x, p: f'₹{x/1000:.0f}K'))
-            
-            # Style the legend
-            legend = ax.legend(frameon=True, facecolor=self.colors['surface_variant'], 
-                             edgecolor=self.colors['text_muted'], fontsize=8)
-            legend.get_frame().set_alpha(0.9)
-            for text in legend.get_texts():
-                text.set_color(self.colors['text'])
-            
-            # Remove top and right spines
-            ax.spines['top'].set_visible(False)
-            ax.spines['right'].set_visible(False)
-            ax.spines['left'].set_color(self.colors['text_muted'])
-            ax.spines['bottom'].set_color(self.colors['text_muted'])
-            
-            # Tight layout
-            plt.tight_layout()
-            
-            # Convert to image
-            buf = io.BytesIO()
-            plt.savefig(buf, format='png', facecolor=self.colors['surface'], 
-                       dpi=100, bbox_inches='tight', pad_inches=0.1)
-            buf.seek(0)
-            
-            # Close the figure to free memory
-            plt.close(fig)
-            
-            # Load image and display
-            img = Image.open(buf)
-            
-            # Convert PIL image to PhotoImage and display directly in section
-            photo = ImageTk.PhotoImage(img)
-            
-            # Create label to hold the chart image (more compact)
-            chart_label = ctk.CTkLabel(parent, image=photo, text="")
-            chart_label.image = photo  # Keep a reference
-            chart_label.pack(pady=(5, 10), padx=10)
-            
-        except Exception as e:
-            print(f"Error creating modern chart: {e}")
+    def load_financial_overview(self, placeholder, balance_label):
+        """Read the transaction rollups and render the chart off the Tk thread, then swap both in"""
+        def load():
+            try:
+                from RAG_Gmail import get_financial_overview
+                overview = get_financial_overview()
+            except Exception as e:
+                print(f"Error loading financial overview: {e}")
+                overview = None
+            series = overview or {'days': [], 'credits': [], 'debits': []}
+            try:
+                key, image = render_chart(series['days'], series['credits'], series['debits'], self.colors)
+            except Exception as e:
+                print(f"Error creating modern chart: {e}")
+                key, image = None, None
+            self.root.after(0, lambda: self.show_financial_overview(placeholder, balance_label, overview, key, image))
+        
+        threading.Thread(target=load, daemon=True).start()
+    
+    def show_financial_overview(self, placeholder, balance_label, overview, key, image):
+        self.overview = overview
+        self.show_balance(balance_label, overview)
+        self.show_chart(placeholder, key, image)
+    
+    def show_balance(self, balance_label, overview):
+        if not balance_label.winfo_exists():
+            return
+        if overview is None:
+            balance_label.configure(text="Balance: unavailable", text_color=self.colors['text_muted'])
+        elif overview['balance'] is not None:
+            # The available balance quoted by the latest bank alert
+            balance = overview['balance']
+            balance_label.configure(text=f"Balance: ₹{balance:,.2f}",
+                                    text_color=self.colors['text_success'] if balance > 0 else self.colors['accent'])
+        else:
+            net = overview['week_credits'] - overview['week_debits']
+            balance_label.configure(text=f"This week: ₹{net:,.2f}",
+                                    text_color=self.colors['text_success'] if net >= 0 else self.colors['accent'])
+    
+    def show_chart(self, placeholder, key, image):
+        """Swap a rendered chart into its placeholder; the drawing already happened on the worker"""
+        if not placeholder.winfo_exists():
+            return  # The sidebar was rebuilt while the chart rendered
+        if image is None:
+            parent = placeholder.master
+            placeholder.destroy()
             # Fallback to simple text display
             fallback_container = ctk.CTkFrame(parent, fg_color=self.colors['surface'], corner_radius=12)
             fallback_container.pack(fill='x', pady=(0, 25))
@@ -361,6 +614,20 @@ class GmailAssistantUI:
                         text="📊 Financial Chart\n(Install matplotlib, seaborn & pandas for enhanced view)",
                         text_color=self.colors['text'],
                         font=("JetBrains Mono", 10)).pack(pady=20)
+            return
+        if getattr(placeholder, 'chart_key', None) == key:
+            return  # Unchanged data, nothing to redraw
+        
+        if self.chart is None or self.chart[0] != key:
+            from PIL import ImageTk
+            self.chart = (key, ImageTk.PhotoImage(image))
+        self.place_chart(placeholder, *self.chart)
+    
+    def place_chart(self, placeholder, key, photo):
+        # The placeholder label becomes the chart
+        placeholder.configure(image=photo, text="")
+        placeholder.image = photo  # Keep a reference
+        placeholder.chart_key = key
     
     def toggle_sidebar(self):
         """Toggle sidebar collapse/expand instantly"""
@@ -417,18 +684,10 @@ class GmailAssistantUI:
                                  font=("JetBrains Mono", 14, "bold"))
         fin_header.pack(side='left', padx=(8, 0))
         
-        # Mock financial data (in rupees)
-        credits = [25000, 32000, 28000, 41000, 35000, 29000, 38000]
-        debits = [18000, 21000, 24000, 22000, 26000, 23000, 25000]
-        days = ['Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun']
-        
-        # Create modern Plotly chart
-        self.create_modern_chart(fin_section, credits, debits, days)
-        
-        # Balance summary with enhanced styling
-        total_credits = sum(credits)
-        total_debits = sum(debits)
-        balance = total_credits - total_debits
+        # The chart and balance are filled in from the transaction rollups once they've been read
+        chart_placeholder = ctk.CTkLabel(fin_section, text="Loading chart...", text_color=self.colors['text_muted'],
+                                         font=("JetBrains Mono", 10))
+        chart_placeholder.pack(pady=(5, 10), padx=10)
         
         # Compact balance frame with consistent colors
         balance_frame = ctk.CTkFrame(parent, fg_color=self.colors['surface_variant'], corner_radius=10)
@@ -443,10 +702,20 @@ class GmailAssistantUI:
         balance_icon.pack(side='left')
         
         # Balance text with consistent color palette (smaller font)
-        balance_text = ctk.CTkLabel(balance_container, text=f"Balance: ₹{balance:,}", 
-                                   text_color=self.colors['text_success'] if balance > 0 else self.colors['accent'],
+        balance_text = ctk.CTkLabel(balance_container, text="Balance: ...", 
+                                   text_color=self.colors['text_muted'],
                                    font=("JetBrains Mono", 14, "bold"))
         balance_text.pack(side='left', padx=(8, 0))
+        
+        # Kept so a finished sync can refresh the figures in place
+        self.chart_placeholder = chart_placeholder
+        self.balance_text = balance_text
+        # A rebuilt sidebar shows the last figures straight away; the reload only swaps in changes
+        if self.overview is not None:
+            self.show_balance(balance_text, self.overview)
+        if self.chart is not None:
+            self.place_chart(chart_placeholder, *self.chart)
+        self.load_financial_overview(chart_placeholder, balance_text)
     
     def create_task_section(self, parent):
         # Compact task section with consistent colors
@@ -527,16 +796,14 @@ class GmailAssistantUI:
         
         # Custom chat display using Canvas for smooth scrolling
         self.chat_canvas = tk.Canvas(chat_container, bg="#1e1e2e", highlightthickness=0)
-        self.chat_frame = ctk.CTkFrame(self.chat_canvas, fg_color="transparent")
         
         # Pack canvas without scrollbar
         self.chat_canvas.pack(fill="both", expand=True)
         
-        # Create window in canvas
-        self.canvas_window = self.chat_canvas.create_window((0, 0), window=self.chat_frame, anchor="nw")
+        # Only the messages in view get bubble widgets
+        self.transcript = ChatTranscript(self.chat_canvas, self.colors)
         
         # Bind events for scrolling
-        self.chat_frame.bind('<Configure>', self.on_frame_configure)
         self.chat_canvas.bind('<Configure>', self.on_canvas_configure)
         self.chat_canvas.bind_all("<MouseWheel>", self.on_mousewheel)
     
@@ -587,12 +854,9 @@ class GmailAssistantUI:
             self.send_message()
             return 'break'  # Prevent default behavior
     
-    def on_frame_configure(self, event):
-        self.chat_canvas.configure(scrollregion=self.chat_canvas.bbox("all"))
-    
     def on_canvas_configure(self, event):
-        canvas_width = event.width
-        self.chat_canvas.itemconfig(self.canvas_window, width=canvas_width)
+        # Reflow happens on the next idle render, once per burst of resize events
+        self.transcript.schedule_render()
     
     def on_mousewheel(self, event):
         # Get current scroll position
@@ -613,11 +877,8 @@ class GmailAssistantUI:
         self.chat_canvas.yview_scroll(scroll_direction, "units")
     
     def add_message_bubble(self, text, is_user=True):
-        bubble = MessageBubble(self.chat_frame, text, is_user)
-        bubble.pack(fill='x', padx=10, pady=2)
-        
-        # Simple scroll to bottom
-        self.root.after(10, lambda: self.chat_canvas.yview_moveto(1.0))
+        """Add a message to the transcript and scroll to it; returns its TranscriptEntry"""
+        return self.transcript.add(text, is_user)
     
     def update_status(self, status, color="#a6e3a1"):  # Catppuccin Green
         # Map common status colors to Catppuccin equivalents
@@ -629,20 +890,63 @@ class GmailAssistantUI:
         catppuccin_color = color_map.get(color, color)
         # Use text_color instead of fg for CustomTkinter compatibility
         self.status_label.configure(text=f"● {status}", text_color=catppuccin_color)
-        self.root.update()
     
     def load_initial_emails(self):
+        """Sync emails on a worker thread; the UI polls its progress queue"""
+        print("Loading initial emails...")  # Debug print
+        self.sync_queue = queue.Queue()
+        self.sync_cancel = threading.Event()
+        self.update_status("Syncing emails...", "#fbbf24")
+        self.stop_sync_btn.pack(side='left', pady=20)
+        self.add_message_bubble("Syncing your emails in the background. You can already ask questions about mail indexed earlier.", False)
+        threading.Thread(target=self.run_email_sync, daemon=True).start()
+        self.root.after(100, self.poll_email_sync)
+    
+    def run_email_sync(self):
+        # Worker thread: never touch widgets here, only the queue
         try:
-            print("Loading initial emails...")  # Debug print
-            self.update_status("Loading emails...", "#fbbf24")
-            load_emails()
-            self.add_message_bubble("Emails loaded successfully! You can start asking questions about your Gmail.", False)
+            from RAG_Gmail import load_emails
+            result = load_emails(progress=self.sync_queue.put, cancel_event=self.sync_cancel)
+            self.sync_queue.put({'stage': 'done', **result})
+        except Exception as e:
+            self.sync_queue.put({'stage': 'error', 'error': str(e)})
+    
+    def cancel_email_sync(self):
+        self.sync_cancel.set()
+        self.stop_sync_btn.configure(state='disabled', text="Stopping...")
+    
+    def poll_email_sync(self):
+        # Only the latest progress matters, so drain the queue and show the last update
+        latest = None
+        try:
+            while True:
+                latest = self.sync_queue.get_nowait()
+                if latest['stage'] in ('done', 'error'):
+                    break
+        except queue.Empty:
+            pass
+        
+        if latest is None:
+            self.root.after(200, self.poll_email_sync)
+        elif latest['stage'] == 'done':
+            self.stop_sync_btn.pack_forget()
+            if latest['cancelled']:
+                self.add_message_bubble(f"Email sync stopped. {latest['added']} new emails were indexed.", False)
+            else:
+                self.add_message_bubble("Emails loaded successfully! You can start asking questions about your Gmail.", False)
+            if (latest['added'] or latest['removed']) and not self.sidebar_collapsed:
+                self.load_financial_overview(self.chart_placeholder, self.balance_text)
             self.update_status("Ready")
             print("Emails loaded successfully")  # Debug print
-        except Exception as e:
-            print(f"Error loading emails: {str(e)}")  # Debug print
-            self.add_message_bubble(f"Failed to load emails: {str(e)}", False)
+        elif latest['stage'] == 'error':
+            print(f"Error loading emails: {latest['error']}")  # Debug print
+            self.stop_sync_btn.pack_forget()
+            self.add_message_bubble(f"Failed to load emails: {latest['error']}", False)
             self.update_status("Error loading emails", "#ef4444")
+        else:
+            self.update_status(f"Syncing: {latest['fetched']} fetched, {latest['summarized']} summarized, "
+                               f"{latest['indexed']} indexed", "#fbbf24")
+            self.root.after(200, self.poll_email_sync)
     
     def send_message(self):
         query = self.input_field.get().strip()
@@ -663,17 +967,51 @@ class GmailAssistantUI:
     
     def process_query(self, query):
         try:
+            from RAG_Gmail import ask_question_stream
+            # Tokens are buffered here by the worker and drained on the Tk thread,
+            # at most one pending flush at a time so fast streams don't flood the event loop
+            stream = {'bubble': None, 'buffer': [], 'flush_scheduled': False}
+            stream_lock = threading.Lock()
+            
+            def flush_tokens():
+                with stream_lock:
+                    text = "".join(stream['buffer'])
+                    stream['buffer'] = []
+                    stream['flush_scheduled'] = False
+                with span('ui.render', chars=len(text), first=stream['bubble'] is None):
+                    if stream['bubble'] is None:
+                        # First tokens: this is the moment the user stops waiting
+                        stream['bubble'] = self.add_message_bubble(text, False)
+                        self.root.title("Gmail Assistant")
+                    else:
+                        stream['bubble'].append_text(text)
+                        self.transcript.scroll_to_end()
+            
+            def on_token(token):
+                with stream_lock:
+                    stream['buffer'].append(token)
+                    if stream['flush_scheduled']:
+                        return
+                    stream['flush_scheduled'] = True
+                self.root.after(30, flush_tokens)
+            
+            def finish(text):
+                # The final reply replaces the streamed text (it may carry an error note)
+                with span('ui.render', chars=len(text), final=True):
+                    if stream['bubble'] is None:
+                        stream['bubble'] = self.add_message_bubble(text, False)
+                    else:
+                        stream['bubble'].set_text(text)
+                    self.root.title("Gmail Assistant")
+            
             if self.new_conversation:
-                self.messages, response = ask_question(query)
+                self.messages, response = ask_question_stream(query, on_token=on_token)
                 self.new_conversation = False
             else:
-                self.messages, response = ask_question(query, messages=self.messages)
+                self.messages, response = ask_question_stream(query, messages=self.messages, on_token=on_token)
             
-            # Add response immediately
-            self.root.after(0, lambda: self.add_message_bubble(response, False))
-            
-            # Reset title immediately
-            self.root.after(0, lambda: self.root.title("Gmail Assistant"))
+            # Scheduled after every token flush, so it runs last
+            self.root.after(40, lambda: finish(response))
             
             # Use a thread for text-to-speech to avoid blocking
             threading.Thread(target=self.speak_text, args=(response,), daemon=True).start()
@@ -685,10 +1023,19 @@ class GmailAssistantUI:
             self.root.after(0, lambda: self.add_message_bubble(f"Error: {str(e)}", False))
             self.root.after(0, lambda: self.root.title("Gmail Assistant - Error"))
     
+    def get_tts_engine(self):
+        with self.tts_lock:
+            if self.engine is None:
+                import pyttsx3
+                self.engine = pyttsx3.init()
+            return self.engine
+    
     def speak_text(self, text):
         try:
-            self.engine.say(text)
-            self.engine.runAndWait()
+            with span('tts', chars=len(text)):
+                engine = self.get_tts_engine()
+                engine.say(text)
+                engine.runAndWait()
         except:
             pass  # Ignore TTS errors
     
@@ -718,8 +1065,7 @@ class GmailAssistantUI:
         self.messages = None
         
         # Clear chat display
-        for widget in self.chat_frame.winfo_children():
-            widget.destroy()
+        self.transcript.clear()
         
         # Add welcome message
         self.add_message_bubble("New conversation started! How can I help you with your emails?", False)
@@ -0,0 +1,236 @@
+# Standard library imports
+from datetime import timezone
+import re
+import sqlite3
+import threading
+
+# Third-party library imports
+import dateutil.parser
+
+# Local modules
+from chunking import create_chunk_schema
+from embeddings import create_embedding_cache_schema
+from transactions import backfill_transactions, create_transaction_schema
+
+BUSY_TIMEOUT = 30.0  # Seconds a connection waits for another writer before raising
+
+def format_date(value):
+    """ Store dates as UTC ISO-8601 text, so string order is time order and they can be range-scanned. """
+    if value is None:
+        return None
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc).isoformat()
+
+def create_fts_schema(cursor):
+    """ Full-text index over Metadata.text, kept in sync by triggers. Skipped if SQLite lacks FTS5. """
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE name='MetadataFTS'")
+    if cursor.fetchone():
+        return
+    try:
+        cursor.execute("CREATE VIRTUAL TABLE MetadataFTS USING fts5(text, content='Metadata', content_rowid='id')")
+    except sqlite3.OperationalError as e:
+        print(f"(EMAILS LOADER): Full-text search unavailable, hybrid retrieval disabled: {e}")
+        return
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS metadata_fts_insert AFTER INSERT ON Metadata BEGIN
+            INSERT INTO MetadataFTS (rowid, text) VALUES (new.id, new.text);
+        END
+        ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS metadata_fts_delete AFTER DELETE ON Metadata BEGIN
+            INSERT INTO MetadataFTS (MetadataFTS, rowid, text) VALUES ('delete', old.id, old.text);
+        END
+        ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS metadata_fts_update AFTER UPDATE OF text ON Metadata BEGIN
+            INSERT INTO MetadataFTS (MetadataFTS, rowid, text) VALUES ('delete', old.id, old.text);
+            INSERT INTO MetadataFTS (rowid, text) VALUES (new.id, new.text);
+        END
+        ''')
+    # Index the rows that existed before the table did
+    cursor.execute("INSERT INTO MetadataFTS (MetadataFTS) VALUES ('rebuild')")
+
+def migrate_v1(cursor):
+    """ The schema as it stood before versioning; written to also upgrade any of its older shapes. """
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS Metadata (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            text TEXT NOT NULL,
+            gmail_id TEXT,
+            vector_id INTEGER
+        )
+        ''')
+    # Upgrade stores created before gmail_id/vector_id existed
+    columns = {row[1] for row in cursor.execute("PRAGMA table_info(Metadata)")}
+    if 'gmail_id' not in columns:
+        cursor.execute("ALTER TABLE Metadata ADD COLUMN gmail_id TEXT")
+    if 'vector_id' not in columns:
+        cursor.execute("ALTER TABLE Metadata ADD COLUMN vector_id INTEGER")
+    # Legacy rows are keyed in FAISS by their row id (see migrate_positional_index)
+    cursor.execute("UPDATE Metadata SET vector_id = id WHERE vector_id IS NULL")
+    cursor.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_metadata_gmail_id ON Metadata (gmail_id)")
+    cursor.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_metadata_vector_id ON Metadata (vector_id)")
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS Settings (
+            key TEXT PRIMARY KEY,
+            value TEXT
+        )
+        ''')
+    create_embedding_cache_schema(cursor)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS SummaryCache (
+            gmail_id TEXT NOT NULL,
+            body_hash TEXT NOT NULL,
+            prompt_version INTEGER NOT NULL,
+            summary TEXT NOT NULL,
+            PRIMARY KEY (gmail_id, body_hash, prompt_version)
+        )
+        ''')
+    create_fts_schema(cursor)
+
+# LLM summaries write Indian times as "IST", which dateutil does not know
+SUMMARY_TZINFOS = {'IST': 19800}
+SUMMARY_FIELD_PATTERN = re.compile(r"^(Date and Time|Sender|Subject):[ \t]*(.*)$", re.MULTILINE)
+
+def migrate_v2(cursor):
+    """ Structured columns for filtering, backfilled from the header lines of existing summaries. """
+    columns = {row[1] for row in cursor.execute("PRAGMA table_info(Metadata)")}
+    for column in ('sender', 'date', 'subject', 'body_hash', 'summary'):
+        if column not in columns:
+            cursor.execute(f"ALTER TABLE Metadata ADD COLUMN {column} TEXT")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_metadata_date ON Metadata (date)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_metadata_sender ON Metadata (sender)")
+
+    cursor.execute("SELECT id, text FROM Metadata WHERE date IS NULL")
+    updates = []
+    for row_id, text in cursor.fetchall():
+        fields = {name: value.strip() for name, value in SUMMARY_FIELD_PATTERN.findall(text)}
+        try:
+            date = format_date(dateutil.parser.parse(fields['Date and Time'], tzinfos=SUMMARY_TZINFOS))
+        except (KeyError, ValueError, OverflowError):
+            date = None
+        updates.append((fields.get('Sender', '').lower() or None, date, fields.get('Subject') or None, text, row_id))
+    cursor.executemany("UPDATE Metadata SET sender=?, date=?, subject=?, summary=? WHERE id=?", updates)
+
+def migrate_v3(cursor):
+    """ Gmail label ids, stored comma-separated. Older rows stay NULL and never match a label filter. """
+    columns = {row[1] for row in cursor.execute("PRAGMA table_info(Metadata)")}
+    if 'labels' not in columns:
+        cursor.execute("ALTER TABLE Metadata ADD COLUMN labels TEXT")
+
+def migrate_v4(cursor):
+    """ Transactions parsed from bank alerts, with incrementally maintained daily and weekly rollups. """
+    create_transaction_schema(cursor)
+    backfill_transactions(cursor)
+
+def migrate_v5(cursor):
+    """ Body chunks of emails indexed chunk by chunk, each with its own vector. """
+    create_chunk_schema(cursor)
+
+def migrate_v6(cursor):
+    """ Per-message ingestion state, so an interrupted sync resumes instead of starting over.
+
+    'stored' messages are committed here but may be missing from the index file, 'indexed'
+    ones are in it, 'skipped' ones were fetched and turned away by the sync filter,
+    'failed' ones couldn't be fetched and are retried by the next sync, and 'deleted' ones
+    were removed here but may still be in the index file. Emails stored before this table
+    existed are all in the index.
+    """
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS IngestState (
+            gmail_id TEXT PRIMARY KEY,
+            state TEXT NOT NULL CHECK (state IN ('stored', 'indexed', 'skipped', 'failed', 'deleted'))
+        )
+        ''')
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_ingest_state_state ON IngestState (state)")
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS metadata_ingest_state_delete AFTER DELETE ON Metadata BEGIN
+            DELETE FROM IngestState WHERE gmail_id = old.gmail_id;
+        END
+        ''')
+
+# Append new migrations here; never edit one that has shipped
+MIGRATIONS = [migrate_v1, migrate_v2, migrate_v3, migrate_v4, migrate_v5, migrate_v6]
+SCHEMA_VERSION = len(MIGRATIONS)
+
+def migrate(conn):
+    """ Bring the database up to SCHEMA_VERSION, tracked in PRAGMA user_version.
+
+    Each step runs in its own write transaction, so an interrupted upgrade resumes from
+    the last completed version and two processes upgrading at once don't both apply it.
+    """
+    for version, migration in enumerate(MIGRATIONS, start=1):
+        if conn.execute("PRAGMA user_version").fetchone()[0] >= version:
+            continue
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if conn.execute("PRAGMA user_version").fetchone()[0] < version:
+                migration(conn.cursor())
+                conn.execute(f"PRAGMA user_version = {version}")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
+def connect(path):
+    conn = sqlite3.connect(path, timeout=BUSY_TIMEOUT, check_same_thread=False)
+    # Readers keep reading while ingestion writes, instead of waiting on the file lock
+    conn.execute("PRAGMA journal_mode=WAL")
+    # In WAL mode this only risks the last transactions on power loss, never corruption
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+class MetaStore:
+    """ Per-thread pool of WAL connections to one metadata database.
+
+    Each thread reuses its own connection for its lifetime. Connections of threads that
+    have exited go back to the pool the next time any thread asks for one, so the UI's
+    thread per question still reuses connections instead of opening one per question. The
+    schema is migrated once, by the first connection.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._connections = {}  # threading.Thread -> connection
+        self._idle = []  # Connections of exited threads, ready for new ones
+        self._migrated = False
+
+    def connection(self):
+        thread = threading.current_thread()
+        with self._lock:
+            conn = self._connections.get(thread)
+            if conn is not None:
+                return conn
+            for other in [t for t in self._connections if not t.is_alive()]:
+                self._idle.append(self._connections.pop(other))
+            if self._idle:
+                conn = self._idle.pop()
+                # A thread that died mid-transaction mustn't leave it to the next one
+                if conn.in_transaction:
+                    conn.rollback()
+            else:
+                conn = connect(self.path)
+                if not self._migrated:
+                    migrate(conn)
+                    self._migrated = True
+            self._connections[thread] = conn
+            return conn
+
+    def close(self):
+        with self._lock:
+            for conn in list(self._connections.values()) + self._idle:
+                conn.close()
+            self._connections.clear()
+            self._idle.clear()
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+def get_meta_store(path):
+    """ Return the process-wide MetaStore for path, so all callers share one pool per file. """
+    with _stores_lock:
+        if path not in _stores:
+            _stores[path] = MetaStore(path)
+        return _stores[path]
@@ -0,0 +1,159 @@
+# Standard library imports
+from datetime import datetime, timedelta
+import re
+
+# Third-party library imports
+import dateutil.parser
+from dateutil.relativedelta import relativedelta
+from tzlocal import get_localzone
+
+# Local modules
+from meta_store import format_date
+
+# Filters are plain dicts with any of these keys:
+#   after  - datetime, inclusive lower bound on the email date
+#   before - datetime, exclusive upper bound on the email date
+#   sender - substring of the From address, case-insensitive
+#   label  - Gmail label id the email must carry, e.g. 'INBOX' or 'IMPORTANT'
+
+MONTHS = ['january', 'february', 'march', 'april', 'may', 'june', 'july',
+          'august', 'september', 'october', 'november', 'december']
+UNITS = {'day': 'days', 'week': 'weeks', 'month': 'months', 'year': 'years'}
+
+RELATIVE_PATTERN = re.compile(r"\b(this|last|previous|past)\s+(day|week|month|year)\b")
+LAST_N_PATTERN = re.compile(r"\b(?:last|past|previous)\s+(\d+)\s+(day|week|month|year)s?\b")
+MONTH_PATTERN = re.compile(r"\b(?:in|during|for)\s+(" + "|".join(MONTHS) + r"|" +
+                           "|".join(m[:3] for m in MONTHS) + r")\b\.?(?:\s*,?\s*(\d{4}))?")
+ANCHORED_PATTERN = re.compile(r"\b(since|after|before|on)\s+((?:\d{1,4}[/.-]\d{1,2}(?:[/.-]\d{2,4})?)|"
+                              r"(?:\d{1,2}(?:st|nd|rd|th)?\s+[a-z]{3,9}(?:\s+\d{4})?)|"
+                              r"(?:[a-z]{3,9}\s+\d{1,2}(?:st|nd|rd|th)?(?:,?\s+\d{4})?))")
+# "since last month" starts where "last month" does and runs up to now
+OPEN_ENDED_PATTERN = re.compile(r"\b(?:since|after)\s+(?:the\s+)?$")
+
+def start_of_day(moment):
+    return moment.replace(hour=0, minute=0, second=0, microsecond=0)
+
+def period_start(moment, unit):
+    """ The start of the calendar day, week (Monday), month or year containing moment. """
+    day = start_of_day(moment)
+    if unit == 'week':
+        return day - timedelta(days=day.weekday())
+    if unit == 'month':
+        return day.replace(day=1)
+    if unit == 'year':
+        return day.replace(month=1, day=1)
+    return day
+
+def parse_anchor(text, now):
+    """ Parse an explicit date like 25/09/2025 or 3rd September, reading numbers day first as Indian banks write them. """
+    try:
+        moment = dateutil.parser.parse(text, dayfirst=True, default=start_of_day(now).replace(tzinfo=None))
+    except (ValueError, OverflowError):
+        return None
+    moment = moment.replace(tzinfo=now.tzinfo)
+    if moment > now and not re.search(r"\d{4}", text):
+        # A date without a year that hasn't come yet means last year's
+        moment -= relativedelta(years=1)
+    return moment
+
+def parse_date_range(question, now=None):
+    """ Resolve a relative or explicit date phrase in question to (after, before).
+
+    Understands today/yesterday, this/last day|week|month|year, last N days|weeks|months,
+    in <month> [year], and since/after/before/on <date>. Either bound may be None; returns
+    None when the question mentions no date at all. A period after since/after keeps only
+    its lower bound.
+
+    >>> now = datetime(2025, 10, 17, 9, 30)
+    >>> parse_date_range("what was debited last month", now)
+    (datetime.datetime(2025, 9, 1, 0, 0), datetime.datetime(2025, 10, 1, 0, 0))
+    >>> parse_date_range("credits since last month", now)
+    (datetime.datetime(2025, 9, 1, 0, 0), None)
+    >>> parse_date_range("anything after yesterday", now)
+    (datetime.datetime(2025, 10, 16, 0, 0), None)
+    >>> parse_date_range("spent in september", now)
+    (datetime.datetime(2025, 9, 1, 0, 0), datetime.datetime(2025, 10, 1, 0, 0))
+    >>> parse_date_range("debits since 3rd october", now)
+    (datetime.datetime(2025, 10, 3, 0, 0), None)
+    """
+    now = now or datetime.now(get_localzone())
+    text = question.lower()
+
+    def open_ended(match):
+        return OPEN_ENDED_PATTERN.search(text[:match.start()]) is not None
+
+    if re.search(r"\btoday\b", text):
+        return start_of_day(now), None
+    match = re.search(r"\byesterday\b", text)
+    if match:
+        return start_of_day(now) - timedelta(days=1), None if open_ended(match) else start_of_day(now)
+
+    match = LAST_N_PATTERN.search(text)
+    if match:
+        amount, unit = int(match.group(1)), UNITS[match.group(2)]
+        return now - relativedelta(**{unit: amount}), None
+
+    match = RELATIVE_PATTERN.search(text)
+    if match:
+        which, unit = match.groups()
+        if which == 'past':
+            # "the past week" is a rolling window, "last week" the previous calendar week
+            return now - relativedelta(**{UNITS[unit]: 1}), None
+        start = period_start(now, unit)
+        if which == 'this':
+            return start, None
+        return start - relativedelta(**{UNITS[unit]: 1}), None if open_ended(match) else start
+
+    match = MONTH_PATTERN.search(text)
+    if match:
+        month = next(i for i, name in enumerate(MONTHS, start=1) if name.startswith(match.group(1)[:3]))
+        year = int(match.group(2)) if match.group(2) else now.year
+        start = start_of_day(now).replace(year=year, month=month, day=1)
+        if not match.group(2) and start > now:
+            # A bare month that hasn't come yet means last year's
+            start = start.replace(year=year - 1)
+        return start, start + relativedelta(months=1)
+
+    match = ANCHORED_PATTERN.search(text)
+    if match:
+        anchor = parse_anchor(match.group(2), now)
+        if anchor is None:
+            return None
+        keyword = match.group(1)
+        if keyword == 'on':
+            return anchor, anchor + timedelta(days=1)
+        if keyword == 'before':
+            return None, anchor
+        if keyword == 'after':
+            return anchor + timedelta(days=1), None
+        return anchor, None
+
+    return None
+
+def filters_from_question(question, now=None):
+    """ The filters a question implies on its own; currently only its date range. """
+    date_range = parse_date_range(question, now)
+    if date_range is None:
+        return {}
+    after, before = date_range
+    return {key: value for key, value in (('after', after), ('before', before)) if value is not None}
+
+def filter_clause(filters):
+    """ Turn filters into a (WHERE clause, params) pair over the Metadata table. """
+    clauses, params = [], []
+    if filters.get('after') is not None:
+        clauses.append("date >= ?")
+        params.append(format_date(filters['after']))
+    if filters.get('before') is not None:
+        clauses.append("date < ?")
+        params.append(format_date(filters['before']))
+    if filters.get('sender'):
+        clauses.append("sender LIKE ?")
+        params.append(f"%{filters['sender'].lower()}%")
+    if filters.get('label'):
+        clauses.append("(',' || labels || ',') LIKE ?")
+        params.append(f"%,{filters['label']},%")
+    return " AND ".join(clauses) or "1", params
+
+def describe_filters(filters):
+    return ", ".join(f"{key}={value}" for key, value in filters.items()) or "none"
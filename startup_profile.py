@@ -0,0 +1,79 @@
+""" Report what importing the app costs at startup, module by module.
+
+Usage:
+    python startup_profile.py                 # everything `import main` pulls in before the window opens
+    python startup_profile.py RAG_Gmail       # or any other module
+    python startup_profile.py --top 40
+
+Runs the import in a fresh interpreter under `python -X importtime` and lists the slowest
+top-level packages by cumulative time, then flags any of the heavy stacks that main.py is
+meant to load lazily (charts, voice, TTS, faiss, Groq, Google clients).
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+# Packages that should not be imported before the chat window is interactive.
+# PIL is not listed: customtkinter itself imports it.
+DEFERRED_PACKAGES = ['matplotlib', 'seaborn', 'pandas', 'speech_recognition', 'pyttsx3',
+                     'faiss', 'groq', 'googleapiclient', 'google_auth_oauthlib', 'bs4']
+
+def profile_import(module):
+    """ Return ({top-level package: (self us, cumulative us)}, total us) for importing module. """
+    # Make the app's modules importable from any working directory
+    here = os.path.dirname(os.path.abspath(__file__))
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [here, os.environ.get('PYTHONPATH')])))
+    completed = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                               capture_output=True, text=True, env=env)
+    if completed.returncode != 0:
+        raise RuntimeError(completed.stderr.strip().splitlines()[-1] if completed.stderr.strip() else 'import failed')
+
+    # Lines come in completion order, children before their parent, indented by nesting depth:
+    #   import time:  self [us] | cumulative | imported package
+    packages = {}
+    pending = []  # (depth, name, cumulative us) not yet claimed by a parent
+    total = 0
+    for line in completed.stderr.splitlines():
+        if not line.startswith('import time:') or 'imported package' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        depth = len(name) - len(name.lstrip())
+        name = name.strip()
+        top = name.split('.')[0]
+        own, cumulative = packages.get(top, (0, 0))
+        packages[top] = (own + int(self_us), cumulative)
+        while pending and pending[-1][0] > depth:
+            child_depth, child_name, child_cumulative = pending.pop()
+            child_top = child_name.split('.')[0]
+            # A package's time is counted where another package first pulled it in
+            if child_top != top:
+                own, cumulative = packages[child_top]
+                packages[child_top] = (own, cumulative + child_cumulative)
+        pending.append((depth, name, int(cumulative_us)))
+    for _, name, cumulative_us in pending:
+        own, cumulative = packages[name.split('.')[0]]
+        packages[name.split('.')[0]] = (own, cumulative + cumulative_us)
+        total += cumulative_us
+    return packages, total
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('module', nargs='?', default='main')
+    parser.add_argument('--top', type=int, default=25)
+    args = parser.parse_args()
+
+    packages, total = profile_import(args.module)
+    print(f"import {args.module}: {total / 1000:.1f} ms total")
+    print(f"{'package':<32}{'cumulative ms':>15}{'self ms':>10}")
+    for name, (own, cumulative) in sorted(packages.items(), key=lambda item: -item[1][1])[:args.top]:
+        print(f"{name:<32}{cumulative / 1000:>15.1f}{own / 1000:>10.1f}")
+
+    loaded = [name for name in DEFERRED_PACKAGES if name in packages]
+    if loaded:
+        print(f"\nDeferred packages imported by {args.module}: {', '.join(loaded)}")
+    else:
+        print(f"\nNone of the deferred packages are imported by {args.module}.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+# Standard library imports
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import queue
+import re
+import threading
+import time
+
+TOKEN_PIECE_PATTERN = re.compile(r"\w+|[^\w\s]")
+
+def estimate_tokens(text):
+    """ Local approximation of a BPE token count, used for budgeting without a tokenizer.
+
+    Each punctuation mark counts as one token and each word as one token per four characters.
+    """
+    return sum((len(piece) + 3) // 4 for piece in TOKEN_PIECE_PATTERN.findall(text or '')) + 1
+
+class TokenRateLimiter:
+    """ Token bucket that keeps LLM usage under a tokens-per-minute budget.
+
+    acquire() blocks until the estimated cost fits in the bucket; settle() corrects the
+    bucket once the real usage reported by the API is known.
+    """
+
+    def __init__(self, tokens_per_minute):
+        self.capacity = float(tokens_per_minute)
+        self.rate = self.capacity / 60.0
+        self.available = self.capacity
+        self.updated = time.monotonic()
+        self.condition = threading.Condition()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.available = min(self.capacity, self.available + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self, tokens):
+        # A single request larger than the whole budget waits for a full bucket
+        tokens = min(tokens, self.capacity)
+        with self.condition:
+            while True:
+                self._refill()
+                if self.available >= tokens:
+                    self.available -= tokens
+                    return
+                self.condition.wait((tokens - self.available) / self.rate)
+
+    def settle(self, estimated, actual):
+        with self.condition:
+            self._refill()
+            self.available = min(self.capacity, self.available + estimated - actual)
+            self.condition.notify_all()
+
+def ordered_map(fn, items, workers, lookahead=None):
+    """ Yield (item, fn(item)) in input order, running fn on a bounded thread pool.
+
+    At most `lookahead` items (default 2 * workers) are in flight, so a slow consumer
+    applies backpressure instead of letting results pile up in memory.
+    """
+    lookahead = lookahead or workers * 2
+    items = iter(items)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        in_flight = deque()
+        exhausted = False
+        while True:
+            while not exhausted and len(in_flight) < lookahead:
+                try:
+                    item = next(items)
+                except StopIteration:
+                    exhausted = True
+                    break
+                in_flight.append((item, pool.submit(fn, item)))
+            if not in_flight:
+                return
+            item, future = in_flight.popleft()
+            yield item, future.result()
+
+class _Raised:
+    def __init__(self, error):
+        self.error = error
+
+_END = object()
+
+def prefetch(items, maxsize, name=None):
+    """ Iterate items on a background thread, running at most `maxsize` items ahead of the consumer.
+
+    The bounded queue between the two threads is the backpressure: a producer that gets
+    ahead blocks instead of buffering. An exception raised by items is re-raised to the
+    consumer. Closing the returned generator stops the producer at its next item, and the
+    producer then closes items itself, so a chain of prefetch stages shuts down stage by stage.
+    """
+    buffer = queue.Queue(maxsize)
+    stopped = threading.Event()
+
+    def put(item):
+        while not stopped.is_set():
+            try:
+                buffer.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def produce():
+        try:
+            for item in items:
+                if not put(item):
+                    return
+        except Exception as error:
+            put(_Raised(error))
+            return
+        finally:
+            # A generator must be closed on the thread that runs it
+            if hasattr(items, 'close'):
+                items.close()
+        put(_END)
+
+    def consume():
+        threading.Thread(target=produce, name=name, daemon=True).start()
+        try:
+            while True:
+                item = buffer.get()
+                if item is _END:
+                    return
+                if isinstance(item, _Raised):
+                    raise item.error
+                yield item
+        finally:
+            stopped.set()
+
+    return consume()
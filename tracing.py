@@ -0,0 +1,197 @@
+""" Lightweight tracing: timed spans exported as JSON lines and Prometheus-style metrics.
+
+    with span('faiss.search', k=k) as s:
+        ...
+        s.set(found=len(ids))
+
+Spans opened inside another span on the same thread become its children and share its
+trace id, so one question's spans can be grouped afterwards. Tracing stays off until
+configure() enables an exporter; until then span() hands back a shared no-op object, so
+instrumented code pays for a function call and nothing else.
+
+Exporters:
+    jsonl       one JSON object per finished span, appended to the trace file
+    prometheus  per-span duration histograms and error counters in the Prometheus text
+                format, rewritten after each top-level span (for a textfile collector)
+"""
+# Standard library imports
+import atexit
+import functools
+import itertools
+import json
+import os
+import threading
+import time
+
+DURATION_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+METRICS_WRITE_INTERVAL = 1.0  # Seconds between rewrites of the metrics file
+
+class NullSpan:
+    """ Stands in for a Span while tracing is disabled. """
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def set(self, **attrs):
+        pass
+
+NULL_SPAN = NullSpan()
+
+class Span:
+    def __init__(self, tracer, name, attrs):
+        self.tracer = tracer
+        self.name = name
+        self.attrs = attrs
+        self.id = next(tracer.ids)
+        self.parent = None
+        self.trace_id = None
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def __enter__(self):
+        stack = self.tracer.stack()
+        if stack:
+            self.parent = stack[-1]
+            self.trace_id = self.parent.trace_id
+        else:
+            self.trace_id = self.id
+        stack.append(self)
+        self.started = time.time()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.duration = time.perf_counter() - self.start
+        stack = self.tracer.stack()
+        if stack and stack[-1] is self:
+            stack.pop()
+        if exc_type is not None:
+            self.attrs['error'] = exc_type.__name__
+        self.tracer.finish(self)
+        return False
+
+class Tracer:
+    def __init__(self):
+        self.enabled = False
+        self.exporters = set()
+        self.trace_path = None
+        self.metrics_path = None
+        self.ids = itertools.count(1)
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.histograms = {}  # span name -> [bucket counts..., +Inf count, sum]
+        self.errors = {}  # span name -> count
+        self.trace_file = None
+        self.metrics_written = 0.0
+
+    def configure(self, exporters, trace_path='trace.jsonl', metrics_path='metrics.prom'):
+        """ Enable the named exporters ('jsonl', 'prometheus'); an empty list disables tracing. """
+        with self.lock:
+            if self.trace_file is not None:
+                self.trace_file.close()
+                self.trace_file = None
+            self.exporters = {name.strip() for name in exporters if name.strip()}
+            unknown = self.exporters - {'jsonl', 'prometheus'}
+            if unknown:
+                raise ValueError(f"Unknown tracing exporters: {', '.join(sorted(unknown))}")
+            self.trace_path = trace_path
+            self.metrics_path = metrics_path
+            if 'jsonl' in self.exporters:
+                self.trace_file = open(trace_path, 'a', encoding='utf-8', buffering=1)
+            self.enabled = bool(self.exporters)
+
+    def flush(self):
+        """ Write out metrics held back by METRICS_WRITE_INTERVAL; registered to run at exit. """
+        with self.lock:
+            if 'prometheus' not in self.exporters or not self.histograms:
+                return
+            text = self.prometheus_text()
+        self.write_metrics(text)
+
+    def stack(self):
+        stack = getattr(self.local, 'stack', None)
+        if stack is None:
+            stack = self.local.stack = []
+        return stack
+
+    def finish(self, span):
+        with self.lock:
+            histogram = self.histograms.get(span.name)
+            if histogram is None:
+                histogram = self.histograms[span.name] = [0] * (len(DURATION_BUCKETS) + 2)
+            for i, bound in enumerate(DURATION_BUCKETS):
+                if span.duration <= bound:
+                    histogram[i] += 1
+            histogram[-2] += 1
+            histogram[-1] += span.duration
+            if 'error' in span.attrs:
+                self.errors[span.name] = self.errors.get(span.name, 0) + 1
+
+            if self.trace_file is not None:
+                record = {'trace': span.trace_id, 'span': span.id, 'parent': span.parent.id if span.parent else None,
+                          'name': span.name, 'start': span.started, 'duration_ms': round(span.duration * 1000, 3),
+                          'thread': threading.current_thread().name}
+                record.update(span.attrs)
+                self.trace_file.write(json.dumps(record, default=str) + "\n")
+
+            write_metrics = ('prometheus' in self.exporters and span.parent is None
+                             and time.monotonic() - self.metrics_written >= METRICS_WRITE_INTERVAL)
+            if write_metrics:
+                self.metrics_written = time.monotonic()
+                text = self.prometheus_text()
+        if write_metrics:
+            self.write_metrics(text)
+
+    def prometheus_text(self):
+        """ Render the histograms and error counters in the Prometheus text exposition format. """
+        lines = ['# HELP ragrag_span_duration_seconds Time spent in each traced span.',
+                 '# TYPE ragrag_span_duration_seconds histogram']
+        for name, histogram in sorted(self.histograms.items()):
+            for bound, count in zip(DURATION_BUCKETS, histogram):
+                lines.append(f'ragrag_span_duration_seconds_bucket{{span="{name}",le="{bound}"}} {count}')
+            lines.append(f'ragrag_span_duration_seconds_bucket{{span="{name}",le="+Inf"}} {histogram[-2]}')
+            lines.append(f'ragrag_span_duration_seconds_sum{{span="{name}"}} {histogram[-1]:.6f}')
+            lines.append(f'ragrag_span_duration_seconds_count{{span="{name}"}} {histogram[-2]}')
+        lines += ['# HELP ragrag_span_errors_total Spans that ended with an exception.',
+                  '# TYPE ragrag_span_errors_total counter']
+        for name, count in sorted(self.errors.items()):
+            lines.append(f'ragrag_span_errors_total{{span="{name}"}} {count}')
+        return "\n".join(lines) + "\n"
+
+    def write_metrics(self, text):
+        # Write then rename, so a scraper never reads a half-written file
+        temp_path = self.metrics_path + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            f.write(text)
+        os.replace(temp_path, self.metrics_path)
+
+tracer = Tracer()
+atexit.register(tracer.flush)
+
+def configure(exporters, trace_path='trace.jsonl', metrics_path='metrics.prom'):
+    if isinstance(exporters, str):
+        exporters = exporters.split(',')
+    tracer.configure(exporters, trace_path, metrics_path)
+
+def span(name, **attrs):
+    """ Context manager timing the enclosed block as span `name`, with attrs attached to it. """
+    if not tracer.enabled:
+        return NULL_SPAN
+    return Span(tracer, name, attrs)
+
+def traced(name):
+    """ Decorator running every call of the function inside span `name`. """
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not tracer.enabled:
+                return fn(*args, **kwargs)
+            with Span(tracer, name, {}):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
@@ -0,0 +1,218 @@
+# Standard library imports
+from datetime import date, datetime, timedelta
+import re
+
+# Third-party library imports
+from tzlocal import get_localzone
+
+# "An amount of INR 135.00 has been DEBITED to your account XXXX1854 on 25/09/2025."
+ALERT_PATTERN = re.compile(
+    r"(?:INR|Rs\.?|₹)\s*(?P<amount>\d[\d,]*(?:\.\d{1,2})?)\s+has\s+been\s+(?P<direction>DEBITED|CREDITED)\s+"
+    r"(?:to|from|in)\s+your\s+(?:account|a/c)\s+(?:no\.?\s*)?(?P<account>[X*\d]+)\s+on\s+(?P<day>\d{1,2}[/-]\d{1,2}[/-]\d{4})",
+    re.IGNORECASE)
+BALANCE_PATTERN = re.compile(r"Avail(?:able)?\.?\s*bal(?:ance)?\.?\s*(?:is\s*)?(?:INR|Rs\.?|₹)\s*(?P<balance>-?\d[\d,]*(?:\.\d{1,2})?)",
+                             re.IGNORECASE)
+# LLM summaries paraphrase the alert, so the fallback takes a direction and an amount from
+# summaries that read like alerts: debited/credited with a masked account, or an alert subject
+SUMMARY_DIRECTION_PATTERN = re.compile(r"\b(debit(?:ed)?|withdrawn|credit(?:ed)?|deposited)\b(?!\s+card)", re.IGNORECASE)
+SUMMARY_POSTED_PATTERN = re.compile(r"\b(debited|credited)\b", re.IGNORECASE)
+SUMMARY_AMOUNT_PATTERN = re.compile(r"(?:INR|Rs\.?|₹)\s*(?P<amount>\d[\d,]*(?:\.\d{1,2})?)", re.IGNORECASE)
+SUMMARY_ACCOUNT_PATTERN = re.compile(r"\b(X{2,}\d{3,4})\b", re.IGNORECASE)
+SUMMARY_ALERT_SUBJECT_PATTERN = re.compile(r"^Subject:.*\balert\b", re.IGNORECASE | re.MULTILINE)
+CREDIT_WORDS = ('credit', 'deposited')
+
+def parse_amount(text):
+    return float(text.replace(',', ''))
+
+def week_of(day):
+    """ Weekly rollups are keyed by the ISO date of the week's Monday. """
+    return (day - timedelta(days=day.weekday())).isoformat()
+
+def local_day(occurred_at):
+    """ The local calendar day of a stored UTC timestamp, or None. """
+    if not occurred_at:
+        return None
+    return datetime.fromisoformat(occurred_at).astimezone(get_localzone()).date()
+
+def parse_alert(text):
+    """ Parse a Canara Bank transaction alert. Returns a dict or None if text isn't one. """
+    match = ALERT_PATTERN.search(text or '')
+    if not match:
+        return None
+    day_text = re.split(r"[/-]", match.group('day'))
+    balance = BALANCE_PATTERN.search(text[match.end():])
+    return {
+        'direction': 'debit' if match.group('direction').upper() == 'DEBITED' else 'credit',
+        'amount': parse_amount(match.group('amount')),
+        'account': match.group('account'),
+        'day': date(int(day_text[2]), int(day_text[1]), int(day_text[0])),  # Alerts write dd/mm/yyyy
+        'balance': parse_amount(balance.group('balance')) if balance else None,
+    }
+
+def parse_summary(summary, occurred_at):
+    """ Looser parse of an LLM summary, dated by the email itself. Returns a dict or None.
+
+    Offers and card statements quote amounts next to "credited" or "due" too, so only
+    alert-like summaries are parsed. In chunk mode the summary is the whole email document.
+
+    >>> day = '2025-09-25T06:00:00+00:00'
+    >>> parse_summary("Subject: ATM/IMPS/UPI Transaction Alert\\nEmail Context: A debit of INR 135.00 from their account.", day)['amount']
+    135.0
+    >>> parse_summary("Rs 500.00 was credited to account XX1854.", day)['direction']
+    'credit'
+    >>> parse_summary("Subject: Instant cash\\nEmail Context: Personal loans up to Rs 5,00,000 credited in minutes.", day) is None
+    True
+    >>> parse_summary("Subject: Your credit card statement\\nEmail Context: Card XXXX1234. Minimum amount due Rs 2,340.00, pay by 12-Oct.", day) is None
+    True
+    """
+    summary = summary or ''
+    account = SUMMARY_ACCOUNT_PATTERN.search(summary)
+    posted = SUMMARY_POSTED_PATTERN.search(summary)
+    if account and posted:
+        direction = posted
+    elif SUMMARY_ALERT_SUBJECT_PATTERN.search(summary):
+        direction = SUMMARY_DIRECTION_PATTERN.search(summary)
+    else:
+        return None
+    amount = SUMMARY_AMOUNT_PATTERN.search(summary)
+    day = local_day(occurred_at)
+    if not direction or not amount or day is None:
+        return None
+    balance = BALANCE_PATTERN.search(summary)
+    return {
+        'direction': 'credit' if direction.group(1).lower().startswith(CREDIT_WORDS) else 'debit',
+        'amount': parse_amount(amount.group('amount')),
+        'account': account.group(1) if account else None,
+        'day': day,
+        'balance': parse_amount(balance.group('balance')) if balance else None,
+    }
+
+def extract_transaction(email_key, body, summary, occurred_at):
+    """ Transaction row for one email: regexes over the body first, then the stored summary.
+
+    The summary is tried as an exact alert first (fallback summaries quote the body), then
+    with the looser summary parse. Returns None for emails that aren't transaction alerts.
+    """
+    source = 'body'
+    parsed = parse_alert(body)
+    if parsed is None:
+        source = 'summary'
+        parsed = parse_alert(summary) or parse_summary(summary, occurred_at)
+    if parsed is None:
+        return None
+    return dict(parsed, gmail_id=email_key, occurred_at=occurred_at, source=source,
+                week=week_of(parsed['day']), day=parsed['day'].isoformat())
+
+def store_transactions(cursor, transactions):
+    """ Insert transaction rows; the rollup triggers fold them into the daily and weekly totals. """
+    cursor.executemany('''
+        INSERT INTO Transactions (gmail_id, occurred_at, day, week, direction, amount, account, balance, source)
+        VALUES (:gmail_id, :occurred_at, :day, :week, :direction, :amount, :account, :balance, :source)
+        ''', transactions)
+
+def create_transaction_schema(cursor):
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS Transactions (
+            gmail_id TEXT PRIMARY KEY,
+            occurred_at TEXT,
+            day TEXT NOT NULL,
+            week TEXT NOT NULL,
+            direction TEXT NOT NULL CHECK (direction IN ('credit', 'debit')),
+            amount REAL NOT NULL,
+            account TEXT,
+            balance REAL,
+            source TEXT NOT NULL
+        )
+        ''')
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_transactions_occurred_at ON Transactions (occurred_at)")
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS TransactionRollups (
+            period TEXT NOT NULL,
+            bucket TEXT NOT NULL,
+            credits REAL NOT NULL DEFAULT 0,
+            debits REAL NOT NULL DEFAULT 0,
+            credit_count INTEGER NOT NULL DEFAULT 0,
+            debit_count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (period, bucket)
+        )
+        ''')
+    # Rollups are maintained by triggers, so every insert and delete updates them in the same transaction
+    for period, column in (('day', 'day'), ('week', 'week')):
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS transactions_{period}_rollup_insert AFTER INSERT ON Transactions BEGIN
+                INSERT INTO TransactionRollups (period, bucket, credits, debits, credit_count, debit_count)
+                VALUES ('{period}', new.{column},
+                        CASE new.direction WHEN 'credit' THEN new.amount ELSE 0 END,
+                        CASE new.direction WHEN 'debit' THEN new.amount ELSE 0 END,
+                        new.direction = 'credit', new.direction = 'debit')
+                ON CONFLICT (period, bucket) DO UPDATE SET
+                    credits = credits + excluded.credits,
+                    debits = debits + excluded.debits,
+                    credit_count = credit_count + excluded.credit_count,
+                    debit_count = debit_count + excluded.debit_count;
+            END
+            ''')
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS transactions_{period}_rollup_delete AFTER DELETE ON Transactions BEGIN
+                UPDATE TransactionRollups SET
+                    credits = credits - CASE old.direction WHEN 'credit' THEN old.amount ELSE 0 END,
+                    debits = debits - CASE old.direction WHEN 'debit' THEN old.amount ELSE 0 END,
+                    credit_count = credit_count - (old.direction = 'credit'),
+                    debit_count = debit_count - (old.direction = 'debit')
+                WHERE period = '{period}' AND bucket = old.{column};
+            END
+            ''')
+    # A deleted or re-indexed email takes its transaction with it; rows from before gmail ids
+    # were tracked key theirs by row id (see backfill_transactions)
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS metadata_transactions_delete AFTER DELETE ON Metadata BEGIN
+            DELETE FROM Transactions WHERE gmail_id = COALESCE(old.gmail_id, 'row:' || old.id);
+        END
+        ''')
+
+def backfill_transactions(cursor):
+    """ Extract transactions from the emails already stored, before this table existed.
+
+    Rows from before gmail ids were tracked are keyed by their row id, and since those
+    stores could hold the same alert twice, repeats of an identical transaction are skipped.
+    """
+    cursor.execute("SELECT id, gmail_id, text, date FROM Metadata")
+    transactions, seen = [], set()
+    for row_id, gmail_id, text, occurred_at in cursor.fetchall():
+        transaction = extract_transaction(gmail_id or f"row:{row_id}", None, text, occurred_at)
+        if transaction is None:
+            continue
+        if gmail_id is None:
+            signature = tuple(transaction[key] for key in ('day', 'direction', 'amount', 'account', 'balance'))
+            if signature in seen:
+                continue
+            seen.add(signature)
+        transactions.append(transaction)
+    store_transactions(cursor, transactions)
+
+def financial_overview(cursor, days=7, today=None):
+    """ Daily credits and debits for the last `days` days, this week's totals and the latest balance.
+
+    Reads only the precomputed rollups plus one indexed lookup for the balance.
+    """
+    today = today or datetime.now(get_localzone()).date()
+    first = today - timedelta(days=days - 1)
+    cursor.execute("SELECT bucket, credits, debits FROM TransactionRollups "
+                   "WHERE period = 'day' AND bucket BETWEEN ? AND ?", (first.isoformat(), today.isoformat()))
+    by_day = {bucket: (credits, debits) for bucket, credits, debits in cursor.fetchall()}
+    cursor.execute("SELECT credits, debits FROM TransactionRollups WHERE period = 'week' AND bucket = ?",
+                   (week_of(today),))
+    week = cursor.fetchone() or (0.0, 0.0)
+    cursor.execute("SELECT balance FROM Transactions WHERE balance IS NOT NULL "
+                   "ORDER BY occurred_at DESC, day DESC LIMIT 1")
+    balance = cursor.fetchone()
+
+    day_list = [first + timedelta(days=offset) for offset in range(days)]
+    return {
+        'days': [day.strftime('%a') for day in day_list],
+        'credits': [round(by_day.get(day.isoformat(), (0.0, 0.0))[0], 2) for day in day_list],
+        'debits': [round(by_day.get(day.isoformat(), (0.0, 0.0))[1], 2) for day in day_list],
+        'week_credits': round(week[0], 2),
+        'week_debits': round(week[1], 2),
+        'balance': balance[0] if balance else None,
+    }